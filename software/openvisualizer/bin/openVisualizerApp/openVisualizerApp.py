@@ -11,6 +11,7 @@ top-level UI module.  See main() for startup use.
 import sys
 import os
 import logging
+import threading
 import json
 
 from openvisualizer.OVtracer import OVtracer
@@ -18,9 +19,15 @@ from openvisualizer.OVtracer import OVtracer
 log = logging.getLogger('openVisualizerApp')
 
 from openvisualizer.eventBus        import eventBusMonitor
+from openvisualizer.eventBus        import eventBusStats
+from openvisualizer.eventBus        import pcapngWriter
 from openvisualizer.moteProbe       import moteProbe
+from openvisualizer.moteProbe       import moteProbeReactor
+from openvisualizer.moteProbe       import moteProbeCapture
 from openvisualizer.moteConnector   import moteConnector
+from openvisualizer.moteConnector   import ReportAggregator
 from openvisualizer.moteState       import moteState
+from openvisualizer.moteState       import StateHistory
 from openvisualizer.RPL             import RPL
 from openvisualizer.openLbr         import openLbr
 from openvisualizer.openTun         import openTun
@@ -37,7 +44,7 @@ class OpenVisualizerApp(object):
     top-level functionality for several UI clients.
     '''
     
-    def __init__(self,confdir,datadir,logdir,simulatorMode,numMotes,trace,debug,simTopology,iotlabmotes, pathTopo, roverMode):
+    def __init__(self,confdir,datadir,logdir,simulatorMode,numMotes,trace,debug,simTopology,iotlabmotes, pathTopo, roverMode, ioReactor=False, captureDir=None, replayFiles='', replaySpeed=1.0, reportInterval=ReportAggregator.ReportAggregator.LOG_INTERVAL, history=False, eventBusLatency=False, traceSampling=eventBusStats.eventBusStats.TRACE_SAMPLING, pcapFile=None):
         
         # store params
         self.confdir              = confdir
@@ -50,14 +57,25 @@ class OpenVisualizerApp(object):
         self.iotlabmotes          = iotlabmotes
         self.pathTopo             = pathTopo
         self.roverMode            = roverMode
+        self.captureDir           = captureDir
+        self.replayFiles          = replayFiles
 
         # local variables
         self.eventBusMonitor      = eventBusMonitor.eventBusMonitor()
+        self.eventBusStats        = eventBusStats.eventBusStats(traceSampling)
+        self.eventBusStats.enable(eventBusLatency)
+        self.pcapWriter           = pcapngWriter.PcapngWriter(pcapFile) if pcapFile else None
+        self.eventBusMonitor.setPcapWriter(self.pcapWriter)
         self.openLbr              = openLbr.OpenLbr()
         self.rpl                  = RPL.RPL()
         self.topology             = topology.topology()
         self.udpLatency           = UDPLatency.UDPLatency()
+        self.reportAggregator     = ReportAggregator.ReportAggregator(reportInterval)
+        self.stateHistory         = StateHistory.StateHistory() if history else None
         self.DAGrootList          = []
+        self.moteProbeReactor     = None
+        self.moteStatesLock       = threading.Lock()
+        self.moteStatesByAddr     = {}  # 16-bit address (hex) -> moteState
         # create openTun call last since indicates prefix
         self.openTun              = openTun.create() 
         if self.simulatorMode:
@@ -87,21 +105,33 @@ class OpenVisualizerApp(object):
             MoteHandler.readNotifIds(os.path.join(self.datadir, 'sim_files', 'openwsnmodule_obj.h'))
             self.moteProbes       = []
             for _ in range(self.numMotes):
-                moteHandler       = MoteHandler.MoteHandler(oos_openwsn.OpenMote())
+                moteHandler       = MoteHandler.MoteHandler(oos_openwsn.OpenMote(),self.simengine)
                 self.simengine.indicateNewMote(moteHandler)
-                self.moteProbes  += [moteProbe.moteProbe(emulatedMote=moteHandler)]
+                self.moteProbes  += [moteProbe.moteProbe(emulatedMote=moteHandler,captureDir=self.captureDir)]
+        elif self.replayFiles:
+            # in "replay" mode, motes are replaced by captures of their serial port
+            
+            replayFiles           = self.replayFiles.split(',')
+            replayStart           = min(moteProbeCapture.CaptureReader(f).startTime for f in replayFiles)
+            self.moteProbes       = [
+                moteProbe.moteProbe(replayfile=f,replaySpeed=replaySpeed,replayStart=replayStart) for f in replayFiles
+            ]
         elif self.iotlabmotes:
             # in "IoT-LAB" mode, motes are connected to TCP ports
             
+            if ioReactor:
+                self.moteProbeReactor = moteProbeReactor.moteProbeReactor()
             self.moteProbes       = [
-                moteProbe.moteProbe(iotlabmote=p) for p in self.iotlabmotes.split(',')
+                moteProbe.moteProbe(iotlabmote=p,reactor=self.moteProbeReactor,captureDir=self.captureDir) for p in self.iotlabmotes.split(',')
             ]
             
         else:
             # in "hardware" mode, motes are connected to the serial port
 
+            if ioReactor:
+                self.moteProbeReactor = moteProbeReactor.moteProbeReactor()
             self.moteProbes       = [
-                moteProbe.moteProbe(serialport=p) for p in moteProbe.findSerialPorts()
+                moteProbe.moteProbe(serialport=p,reactor=self.moteProbeReactor,captureDir=self.captureDir) for p in moteProbe.findSerialPorts()
             ]
         
         # create a moteConnector for each moteProbe
@@ -111,7 +141,7 @@ class OpenVisualizerApp(object):
         
         # create a moteState for each moteConnector
         self.moteStates           = [
-            moteState.moteState(mc) for mc in self.moteConnectors
+            moteState.moteState(mc,self._indicateMoteAddress) for mc in self.moteConnectors
         ]
 
         if self.roverMode :
@@ -188,6 +218,11 @@ class OpenVisualizerApp(object):
         self.rpl.close()
         for probe in self.moteProbes:
             probe.close()
+        if self.moteProbeReactor:
+            self.moteProbeReactor.close()
+        if self.pcapWriter:
+            self.eventBusMonitor.setPcapWriter(None)
+            self.pcapWriter.close()
                 
     def getMoteState(self, moteid):
         '''
@@ -196,14 +231,8 @@ class OpenVisualizerApp(object):
         :param moteid: 16-bit ID of mote
         :rtype:        moteState or None if not found
         '''
-        for ms in self.moteStates:
-            idManager = ms.getStateElem(ms.ST_IDMANAGER)
-            if idManager and idManager.get16bAddr():
-                addr = ''.join(['%02x'%b for b in idManager.get16bAddr()])
-                if addr == moteid:
-                    return ms
-        else:
-            return None
+        with self.moteStatesLock:
+            return self.moteStatesByAddr.get(moteid)
 
     def refreshRoverMotes(self, roverMotes):
         '''Connect the list of roverMotes to openvisualiser.
@@ -222,7 +251,7 @@ class OpenVisualizerApp(object):
                         if not exist :
                             moc = moteConnector.moteConnector(rm)
                             self.moteConnectors       += [moc]
-                            self.moteStates += [moteState.moteState(moc)]
+                            self.moteStates += [moteState.moteState(moc,self._indicateMoteAddress)]
         self.remoteConnectorServer.initRoverConn(roverMotes)
 
     def removeRoverMotes(self, roverIP, moteList):
@@ -236,11 +265,13 @@ class OpenVisualizerApp(object):
             if ms:
                 self.moteConnectors.remove(ms.moteConnector)
                 self.moteStates.remove(ms)
+                self._forgetMoteAddress(ms)
             else:
                 for mss in self.moteStates:
                     if moteid == mss.moteConnector.serialport:
                         self.moteConnectors.remove(mss.moteConnector)
                         self.moteStates.remove(mss)
+                        self._forgetMoteAddress(mss)
         self.remoteConnectorServer.closeRoverConn(roverIP)
 
 
@@ -251,13 +282,31 @@ class OpenVisualizerApp(object):
         '''
         moteDict = {}
         for ms in self.moteStates:
-            addr = ms.getStateElem(moteState.moteState.ST_IDMANAGER).get16bAddr()
+            addr = ms.getStateElem(moteState.moteState.ST_IDMANAGER).get16bAddrHex()
             if addr:
-                moteDict[''.join(['%02x' % b for b in addr])] = ms.moteConnector.serialport
+                moteDict[addr] = ms.moteConnector.serialport
             else:
                 moteDict[ms.moteConnector.serialport] = None
         return moteDict
 
+    #======================== private =========================================
+
+    def _indicateMoteAddress(self, ms, oldAddr, newAddr):
+        '''
+        Keeps the address index of getMoteState() up to date, called by the
+        moteStates when the 16-bit address of their mote changes.
+        '''
+        with self.moteStatesLock:
+            if self.moteStatesByAddr.get(oldAddr) is ms:
+                del self.moteStatesByAddr[oldAddr]
+            self.moteStatesByAddr[newAddr] = ms
+
+    def _forgetMoteAddress(self, ms):
+        with self.moteStatesLock:
+            for (addr,indexed) in self.moteStatesByAddr.items():
+                if indexed is ms:
+                    del self.moteStatesByAddr[addr]
+
 
 #============================ main ============================================
 import logging.config
@@ -324,7 +373,16 @@ def main(parser=None, roverMode=False):
         simTopology     = argspace.simTopology,
         iotlabmotes     = argspace.iotlabmotes,
         pathTopo        = argspace.pathTopo,
-        roverMode       = roverMode
+        roverMode       = roverMode,
+        ioReactor       = argspace.ioReactor,
+        captureDir      = argspace.captureDir,
+        replayFiles     = argspace.replayFiles,
+        replaySpeed     = argspace.replaySpeed,
+        reportInterval  = argspace.reportInterval,
+        history         = argspace.history,
+        eventBusLatency = argspace.eventBusLatency,
+        traceSampling   = argspace.traceSampling,
+        pcapFile        = argspace.pcapFile,
     )
 
 def _addParserArgs(parser):
@@ -376,6 +434,60 @@ def _addParserArgs(parser):
         action     = 'store',
         help       = 'a topology can be loaded from a json file'
     )
+    parser.add_argument('--reactor',
+        dest       = 'ioReactor',
+        default    = False,
+        action     = 'store_true',
+        help       = 'read all serial ports/IoT-LAB motes from a single thread'
+    )
+    parser.add_argument('--capture',
+        dest       = 'captureDir',
+        default    = None,
+        action     = 'store',
+        help       = 'record the bytes received from each mote into this directory'
+    )
+    parser.add_argument('--replay',
+        dest       = 'replayFiles',
+        default    = '',
+        action     = 'store',
+        help       = 'comma-separated list of capture files to replay instead of motes'
+    )
+    parser.add_argument('--replaySpeed',
+        dest       = 'replaySpeed',
+        type       = float,
+        default    = 1.0,
+        help       = 'replay speed-up factor, 0 to replay as fast as possible'
+    )
+    parser.add_argument('--reportInterval',
+        dest       = 'reportInterval',
+        type       = float,
+        default    = ReportAggregator.ReportAggregator.LOG_INTERVAL,
+        help       = 'minimum interval, in s, between two log lines for a repeated mote info/error/critical report'
+    )
+    parser.add_argument('--history',
+        dest       = 'history',
+        default    = False,
+        action     = 'store_true',
+        help       = 'keep the last 24h of rank, duty cycle, queue occupancy and neighbor RSSI of each mote'
+    )
+    parser.add_argument('--eventBusLatency',
+        dest       = 'eventBusLatency',
+        default    = False,
+        action     = 'store_true',
+        help       = 'record the latency of each event bus callback and trace sampled dispatches'
+    )
+    parser.add_argument('--traceSampling',
+        dest       = 'traceSampling',
+        type       = int,
+        default    = eventBusStats.eventBusStats.TRACE_SAMPLING,
+        help       = 'with --eventBusLatency, trace one event bus dispatch out of this many, 0 to disable tracing'
+    )
+    parser.add_argument('--pcap',
+        dest       = 'pcapFile',
+        default    = None,
+        action     = 'store',
+        help       = 'write the mesh debug packets to this pcapng file, continued in numbered files every 100MB'
+    )
 
 
 def _forceSlashSep(ospath, debug):
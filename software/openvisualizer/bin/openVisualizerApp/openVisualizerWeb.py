@@ -27,6 +27,7 @@ except ImportError:
     print 'sys.path:\n\t{0}'.format('\n\t'.join(str(p) for p in sys.path))
 
 import json
+import hashlib
 import bottle
 import re
 import threading
@@ -39,6 +40,7 @@ from   cmd         import Cmd
 
 import openVisualizerApp
 from openvisualizer.eventBus      import eventBusClient
+from openvisualizer.moteState     import StateHistory
 from openvisualizer.SimEngine     import SimEngine
 from openvisualizer.BspEmulator   import VcdLogger
 from openvisualizer import ovVersion
@@ -54,6 +56,21 @@ class OpenVisualizerWeb(eventBusClient.eventBusClient,Cmd):
     server.
     '''
 
+    # state elements sent for /motedata
+    MOTEDATA_STATES = [
+        moteState.moteState.ST_IDMANAGER,
+        moteState.moteState.ST_ASN,
+        moteState.moteState.ST_ISSYNC,
+        moteState.moteState.ST_MYDAGRANK,
+        moteState.moteState.ST_KAPERIOD,
+        moteState.moteState.ST_OUPUTBUFFER,
+        moteState.moteState.ST_BACKOFF,
+        moteState.moteState.ST_MACSTATS,
+        moteState.moteState.ST_SCHEDULE,
+        moteState.moteState.ST_QUEUE,
+        moteState.moteState.ST_NEIGHBORS,
+    ]
+
     def __init__(self,app,websrv,roverMode):
         '''
         :param app:    OpenVisualizerApp
@@ -117,6 +134,8 @@ class OpenVisualizerWeb(eventBusClient.eventBusClient,Cmd):
         self.websrv.route(path='/moteview',                               callback=self._showMoteview)
         self.websrv.route(path='/moteview/:moteid',                       callback=self._showMoteview)
         self.websrv.route(path='/motedata/:moteid',                       callback=self._getMoteData)
+        self.websrv.route(path='/history',                                callback=self._getHistory)
+        self.websrv.route(path='/network/state',                          callback=self._getNetworkState)
         self.websrv.route(path='/toggleDAGroot/:moteid',                  callback=self._toggleDAGroot)
         self.websrv.route(path='/eventBus',                               callback=self._showEventBus)
         self.websrv.route(path='/routing',                                callback=self._showRouting)
@@ -124,6 +143,8 @@ class OpenVisualizerWeb(eventBusClient.eventBusClient,Cmd):
         self.websrv.route(path='/eventdata',                              callback=self._getEventData)
         self.websrv.route(path='/wiresharkDebug/:enabled',                callback=self._setWiresharkDebug)
         self.websrv.route(path='/gologicDebug/:enabled',                  callback=self._setGologicDebug)
+        self.websrv.route(path='/eventBusLatency/:enabled',               callback=self._setEventBusLatency)
+        self.websrv.route(path='/eventBus/latency',                       callback=self._eventBusLatencyDownload)
         self.websrv.route(path='/topology',                               callback=self._topologyPage)
         self.websrv.route(path='/topology/data',                          callback=self._topologyData)
         self.websrv.route(path='/topology/download',                      callback=self._topologyDownload)
@@ -267,24 +288,94 @@ class OpenVisualizerWeb(eventBusClient.eventBusClient,Cmd):
         ms = self.app.getMoteState(moteid)
         if ms:
             log.debug('Found mote {0} in moteStates'.format(moteid))
-            states = {
-                ms.ST_IDMANAGER   : ms.getStateElem(ms.ST_IDMANAGER).toJson('data'),
-                ms.ST_ASN         : ms.getStateElem(ms.ST_ASN).toJson('data'),
-                ms.ST_ISSYNC      : ms.getStateElem(ms.ST_ISSYNC).toJson('data'),
-                ms.ST_MYDAGRANK   : ms.getStateElem(ms.ST_MYDAGRANK).toJson('data'),
-                ms.ST_KAPERIOD    : ms.getStateElem(ms.ST_KAPERIOD).toJson('data'),
-                ms.ST_OUPUTBUFFER : ms.getStateElem(ms.ST_OUPUTBUFFER).toJson('data'),
-                ms.ST_BACKOFF     : ms.getStateElem(ms.ST_BACKOFF).toJson('data'),
-                ms.ST_MACSTATS    : ms.getStateElem(ms.ST_MACSTATS).toJson('data'),
-                ms.ST_SCHEDULE    : ms.getStateElem(ms.ST_SCHEDULE).toJson('data'),
-                ms.ST_QUEUE       : ms.getStateElem(ms.ST_QUEUE).toJson('data'),
-                ms.ST_NEIGHBORS   : ms.getStateElem(ms.ST_NEIGHBORS).toJson('data'),
-            }
+            
+            # nothing to send if the browser already has this version of the state
+            etag = '"{0}"'.format(ms.getStateVersion(self.MOTEDATA_STATES))
+            response.set_header('ETag',          etag)
+            response.set_header('Cache-Control', 'no-cache')
+            if bottle.request.headers.get('If-None-Match')==etag:
+                response.status = 304
+                return ''
+            
+            states = dict(
+                (name,ms.getStateElemJson(name,'data')) for name in self.MOTEDATA_STATES
+            )
         else:
             log.debug('Mote {0} not found in moteStates'.format(moteid))
             states = {}
         return states
 
+    def _getNetworkState(self):
+        '''
+        Collects the state of all motes in a single response. Query
+        parameters (all optional):
+
+        - elements: comma-separated list of state elements, defaults to the
+          ones of /motedata
+        - fields:   comma-separated list of the fields to return in each row
+        - motes:    comma-separated list of motes (16-bit ID, or serial port
+          for motes which did not report their ID yet)
+
+        Motes are keyed by 16-bit ID, or serial port if not known yet.
+        '''
+        query    = bottle.request.query
+        elements = query.elements.split(',') if query.elements else self.MOTEDATA_STATES
+        fields   = query.fields.split(',')   if query.fields   else None
+        motes    = set(query.motes.split(',')) if query.motes  else None
+        for name in elements:
+            if name not in moteState.moteState.ST_ALL:
+                response.status = 400
+                return {'error': 'No state called {0}'.format(name)}
+
+        moteStates = []
+        for ms in self.app.moteStates:
+            key = ms.getStateElem(moteState.moteState.ST_IDMANAGER).get16bAddrHex() or ms.moteConnector.serialport
+            if motes is None or key in motes:
+                moteStates.append((key,ms))
+
+        # nothing to send if the browser already has this version of the network
+        etag = '"{0}"'.format(hashlib.md5(';'.join(
+            '{0}={1}'.format(key,ms.getStateVersion(elements)) for (key,ms) in moteStates
+        )).hexdigest())
+        response.set_header('ETag',          etag)
+        response.set_header('Cache-Control', 'no-cache')
+        if bottle.request.headers.get('If-None-Match')==etag:
+            response.status = 304
+            return ''
+
+        state = dict(
+            (key,ms.getStateData(elements,fields)) for (key,ms) in moteStates
+        )
+
+        return {'motes': state}
+
+    def _getHistory(self):
+        '''
+        Collects the history of several motes, as column arrays. Query
+        parameters (all optional):
+
+        - motes:  comma-separated list of motes (serial ports)
+        - series: comma-separated list of series, e.g. 'dagRank,rssi.*'
+        - start, end: time range, in seconds since the epoch
+        - tier:   'raw', '10s' or '1min'
+        '''
+        if self.app.stateHistory is None:
+            response.status = 404
+            return {'error': 'history not enabled, start with --history'}
+
+        query = bottle.request.query
+        try:
+            return self.app.stateHistory.query(
+                motes    = query.motes.split(',')    if query.motes  else None,
+                series   = query.series.split(',')   if query.series else None,
+                start    = float(query.start)        if query.start  else None,
+                end      = float(query.end)          if query.end    else None,
+                tier     = query.tier or StateHistory.StateHistory.TIER_RAW,
+            )
+        except ValueError:
+            response.status = 400
+            return {'error': 'invalid query'}
+
     def _setWiresharkDebug(self, enabled):
         '''
         Selects whether eventBus must export debug packets.
@@ -300,6 +391,31 @@ class OpenVisualizerWeb(eventBusClient.eventBusClient,Cmd):
         VcdLogger.VcdLogger().setEnabled(enabled == 'true')
         return '{"result" : "success"}'
 
+    def _setEventBusLatency(self, enabled):
+        '''
+        Selects whether the latency of the event bus callbacks is recorded.
+
+        :param enabled: 'true' if enabled; any other value considered false
+        '''
+        log.info('Enable event bus latency : {0}'.format(enabled))
+        self.app.eventBusStats.enable(enabled == 'true')
+        return '{"result" : "success"}'
+
+    def _eventBusLatencyDownload(self):
+        '''
+        Retrieve the event bus latency statistics and traces, in JSON format,
+        and download them.
+        '''
+        now = datetime.datetime.now()
+
+        response.headers['Content-disposition']='attachement; filename=eventbus_latency_'+now.strftime("%d-%m-%y_%Hh%M")+'.json'
+        response.headers['Content-type']= 'application/json'
+
+        return {
+            'latency'     : self.app.eventBusStats.getStats(),
+            'traces'      : self.app.eventBusStats.getTraces(),
+        }
+
     @view('eventBus.tmpl')
     def _showEventBus(self):
         '''
@@ -458,9 +574,18 @@ class OpenVisualizerWeb(eventBusClient.eventBusClient,Cmd):
     def _getEventData(self):
         response = {
             'isDebugPkts' : 'true' if self.app.eventBusMonitor.wiresharkDebugEnabled else 'false',
+            'isLatency'   : 'true' if self.app.eventBusStats.enabled else 'false',
+            'latency'     : self.app.eventBusStats.getStats(),
             'stats'       : self.app.eventBusMonitor.getStats(),
+            'probes'      : [self._getProbeStats(mp) for mp in self.app.moteProbes],
+            'reports'     : self._dispatchAndGetResult(signal='getReports',data=[]),
         }
         return response
+    
+    def _getProbeStats(self,mp):
+        stats = mp.getRxStats()
+        stats.update(mp.getOutputBufStats())
+        return stats
 
     #===== callbacks
     
@@ -1,5 +1,6 @@
 import sys
 import os
+import json
 
 if __name__=='__main__':
     here = sys.path[0]
@@ -12,11 +13,11 @@ from OpenCli                                     import OpenCli
 
 class serialTesterCli(OpenCli):
     
-    def __init__(self,moteProbe_handler,moteConnector_handler):
+    def __init__(self,moteProbe_handlers,moteConnector_handlers):
         
         # store params
-        self.moteProbe_handler     = moteProbe_handler
-        self.moteConnector_handler = moteConnector_handler
+        self.moteProbe_handlers     = moteProbe_handlers
+        self.moteConnector_handlers = moteConnector_handlers
     
         # initialize parent class
         OpenCli.__init__(self,"Serial Tester",self._quit_cb)
@@ -25,7 +26,7 @@ class serialTesterCli(OpenCli):
         self.registerCommand(
             'pklen',
             'pl',
-            'test packet length, in bytes',
+            'test packet length(s), in bytes, e.g. 10 or 10,40,80 for a sweep',
             ['pklen'],
             self._handle_pklen
         )
@@ -43,6 +44,13 @@ class serialTesterCli(OpenCli):
             ['timeout'],
             self._handle_timeout
         )
+        self.registerCommand(
+            'window',
+            'win',
+            'number of test packets in flight',
+            ['window'],
+            self._handle_window
+        )
         self.registerCommand(
             'trace',
             'trace',
@@ -53,7 +61,7 @@ class serialTesterCli(OpenCli):
         self.registerCommand(
             'testserial',
             't',
-            'test serial port',
+            'test serial port(s), all ports concurrently',
             [],
             self._handle_testserial
         )
@@ -64,6 +72,13 @@ class serialTesterCli(OpenCli):
             [],
             self._handle_stats
         )
+        self.registerCommand(
+            'report',
+            'rep',
+            'write the JSON report of the last test to a file, - for the console',
+            ['filename'],
+            self._handle_report
+        )
         
         # by default, turn trace on
         self._handle_pklen([10])
@@ -78,61 +93,105 @@ class serialTesterCli(OpenCli):
     #===== CLI command handlers
     
     def _handle_pklen(self,params):
-        self.moteConnector_handler.setTestPktLength(int(params[0]))
+        lengths = [int(l) for l in str(params[0]).split(',')]
+        for h in self.moteConnector_handlers:
+            h.setTestPktLengths(lengths)
     
     def _handle_numpk(self,params):
-        self.moteConnector_handler.setNumTestPkt(int(params[0]))
+        for h in self.moteConnector_handlers:
+            h.setNumTestPkt(int(params[0]))
     
     def _handle_timeout(self,params):
-        self.moteConnector_handler.setTimeout(int(params[0]))
+        for h in self.moteConnector_handlers:
+            h.setTimeout(float(params[0]))
+    
+    def _handle_window(self,params):
+        for h in self.moteConnector_handlers:
+            h.setWindow(int(params[0]))
     
     def _handle_trace(self,params):
-        if params[0] in [1,'on','yes']:
-            self.moteConnector_handler.setTrace(self._indicate_trace)
-        else:
-            self.moteConnector_handler.setTrace(None)
+        for h in self.moteConnector_handlers:
+            if params[0] in [1,'on','yes']:
+                h.setTrace(self._indicate_trace)
+            else:
+                h.setTrace(None)
     
     def _handle_testserial(self,params):
-        self.moteConnector_handler.test(blocking=False)
+        for h in self.moteConnector_handlers:
+            h.test(blocking=False)
     
     def _handle_stats(self,params):
-        stats = self.moteConnector_handler.getStats()
         output  = []
-        for k in ['numSent','numOk','numCorrupted','numTimeout']:
-            output += ['- {0:<15} : {1}'.format(k,stats[k])]
+        for h in self.moteConnector_handlers:
+            stats = h.getStats()
+            output += ['{0}{1}'.format(h.moteProbeSerialPort,' (testing)' if h.isTesting() else '')]
+            for k in ['numSent','numOk','numCorrupted','numTimeout']:
+                output += ['- {0:<15} : {1}'.format(k,stats[k])]
+            report = h.getReport()
+            if report and not h.isTesting():
+                for r in report['results']:
+                    output += ['- {0:>4}B: {1:>8.0f} B/s, loss {2:.1%}, rtt p50/p99 {3}'.format(
+                            r['pktLength'],
+                            r['bytesPerSec'],
+                            r['lossRate'],
+                            '{0:.1f}/{1:.1f} ms'.format(r['rttMs']['p50'],r['rttMs']['p99']) if r['rttMs'] else '-',
+                        )
+                    ]
         output  = '\n'.join(output)
         print output
     
+    def _handle_report(self,params):
+        report = json.dumps(
+            [h.getReport() for h in self.moteConnector_handlers],
+            indent    = 4,
+            sort_keys = True,
+        )
+        if params[0]=='-':
+            print report
+        else:
+            with open(params[0],'w') as f:
+                f.write(report)
+    
     def _indicate_trace(self,debugText):
         print debugText
     
     #===== helpers
     
     def _quit_cb(self):
-        self.moteConnector_handler.quit()
-        self.moteProbe_handler.close()
+        for h in self.moteConnector_handlers:
+            h.quit()
+        for h in self.moteProbe_handlers:
+            h.close()
 
 def main():
     
-    moteProbe_handler        = None
-    moteConnector_handler    = None
+    moteProbe_handlers       = []
+    moteConnector_handlers   = []
     
-    # get serial port name
+    # get serial port name(s), 'all' for all the ports motes are connected to
     if len(sys.argv)>1:
-        serialportname = sys.argv[1]
+        serialportnames = sys.argv[1:]
     else:
-        serialportname = raw_input('Serial port to connect to: ')
+        serialportnames = raw_input('Serial port(s) to connect to, or all: ').split()
     
-    serialport = (serialportname, moteProbe.BAUDRATE_GINA)
-    
-    # create a moteProbe
-    moteProbe_handler = moteProbe.moteProbe(serialport)
+    if serialportnames==['all']:
+        serialports = moteProbe.findSerialPorts()
+    else:
+        serialports = [(name, moteProbe.BAUDRATE_GINA) for name in serialportnames]
     
-    # create a SerialTester to attached to the moteProbe
-    moteConnector_handler = SerialTester(serialportname)
+    for serialport in serialports:
+        
+        # create a moteProbe
+        moteProbe_handler = moteProbe.moteProbe(serialport)
+        
+        # create a SerialTester to attached to the moteProbe
+        moteConnector_handler = SerialTester(serialport[0],probe=moteProbe_handler)
+        
+        moteProbe_handlers     += [moteProbe_handler]
+        moteConnector_handlers += [moteConnector_handler]
     
     # create an open CLI
-    cli = serialTesterCli(moteProbe_handler,moteConnector_handler)
+    cli = serialTesterCli(moteProbe_handlers,moteConnector_handlers)
     cli.start()
 
 #============================ application logging =============================
@@ -6,7 +6,6 @@
 # https://openwsn.atlassian.net/wiki/display/OW/License
 import logging
 
-from openvisualizer.SimEngine     import SimEngine
 import BspModule
 
 class BspBoard(BspModule.BspModule):
@@ -17,7 +16,7 @@ class BspBoard(BspModule.BspModule):
     def __init__(self,motehandler):
         
         # store params
-        self.engine          = SimEngine.SimEngine()
+        self.engine          = motehandler.engine
         self.motehandler     = motehandler
         
         # local variables
@@ -6,7 +6,6 @@
 # https://openwsn.atlassian.net/wiki/display/OW/License
 import logging
 
-from openvisualizer.SimEngine     import SimEngine
 import openvisualizer.openvisualizer_utils as u
 import BspModule
 
@@ -22,7 +21,7 @@ class BspBsp_timer(BspModule.BspModule):
     def __init__(self,motehandler):
         
         # store params
-        self.engine          = SimEngine.SimEngine()
+        self.engine          = motehandler.engine
         self.motehandler     = motehandler
         
         # local variables
@@ -6,7 +6,6 @@
 # https://openwsn.atlassian.net/wiki/display/OW/License
 import logging
 
-from openvisualizer.SimEngine   import SimEngine
 import BspModule
 import VcdLogger
 
@@ -18,7 +17,7 @@ class BspDebugpins(BspModule.BspModule):
     def __init__(self,motehandler):
         
         # store params
-        self.engine               = SimEngine.SimEngine()
+        self.engine               = motehandler.engine
         self.motehandler          = motehandler
         
         # local variables
@@ -33,7 +32,13 @@ class BspDebugpins(BspModule.BspModule):
         self.syncPacketPinHigh    = False
         self.syncAckPinHigh       = False
         self.debugPinHigh         = False
-        self.vcdLogger            = VcdLogger.VcdLogger()
+        if self.engine.vcdLogger:
+            self.vcdLogger        = self.engine.vcdLogger
+        elif self.engine.isDefault():
+            self.vcdLogger        = VcdLogger.VcdLogger()
+        else:
+            # named engines only log debugpins when given their own VcdLogger
+            self.vcdLogger        = None
         
         # initialize the parent
         BspModule.BspModule.__init__(self,'BspDebugpins')
@@ -469,6 +474,8 @@ class BspDebugpins(BspModule.BspModule):
     #======================== private =========================================
     
     def _logVcd(self,signal):
+        if not self.vcdLogger:
+            return
         self.vcdLogger.log(
             ts     = self.timeline.getCurrentTime(),
             mote   = self.motehandler.getId(),
@@ -7,8 +7,7 @@
 
 import logging
 
-from openvisualizer.SimEngine     import SimEngine, \
-                                         Propagation
+from openvisualizer.SimEngine     import Propagation
 from openvisualizer.eventBus      import eventBusClient
 import BspModule
 
@@ -41,7 +40,7 @@ class BspRadio(BspModule.BspModule,eventBusClient.eventBusClient):
     def __init__(self,motehandler):
         
         # store params
-        self.engine      = SimEngine.SimEngine()
+        self.engine      = motehandler.engine
         self.motehandler = motehandler
         
         # local variables
@@ -60,7 +59,7 @@ class BspRadio(BspModule.BspModule,eventBusClient.eventBusClient):
         BspModule.BspModule.__init__(self,'BspRadio')
         eventBusClient.eventBusClient.__init__(
             self,
-            name                  = 'BspRadio_{0}'.format(self.motehandler.getId()),
+            name                  = self.engine.getEventBusName('BspRadio_{0}'.format(self.motehandler.getId())),
             registrations         =  [],
         )
         
@@ -7,7 +7,6 @@
 import logging
 import threading
 
-from openvisualizer.SimEngine     import SimEngine
 import BspModule
 
 class BspUart(BspModule.BspModule):
@@ -22,7 +21,7 @@ class BspUart(BspModule.BspModule):
     def __init__(self,motehandler):
         
         # store params
-        self.engine               = SimEngine.SimEngine()
+        self.engine               = motehandler.engine
         self.motehandler          = motehandler
         
         # local variables
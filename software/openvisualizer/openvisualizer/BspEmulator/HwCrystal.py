@@ -9,7 +9,6 @@ import logging
 import random
 import math
 
-from openvisualizer.SimEngine     import SimEngine
 import HwModule
 
 class HwCrystal(HwModule.HwModule):
@@ -23,7 +22,7 @@ class HwCrystal(HwModule.HwModule):
     def __init__(self,motehandler):
         
         # store params
-        self.engine          = SimEngine.SimEngine()
+        self.engine          = motehandler.engine
         self.motehandler     = motehandler
         
         # local variables
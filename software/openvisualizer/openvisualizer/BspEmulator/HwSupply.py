@@ -6,7 +6,6 @@
 # https://openwsn.atlassian.net/wiki/display/OW/License
 import logging
 
-from openvisualizer.SimEngine     import SimEngine
 import HwModule
 
 class HwSupply(HwModule.HwModule):
@@ -19,7 +18,7 @@ class HwSupply(HwModule.HwModule):
     def __init__(self,motehandler):
         
         # store params
-        self.engine          = SimEngine.SimEngine()
+        self.engine          = motehandler.engine
         self.motehandler     = motehandler
         
         # local variables
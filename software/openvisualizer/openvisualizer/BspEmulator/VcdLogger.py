@@ -6,7 +6,6 @@ class VcdLogger(object):
     
     ACTIVITY_DUR   = 1000 # 1000ns=1us
     FILENAME       = 'debugpins.vcd'
-    FILENAME_SWAP  = 'debugpins.vcd.swap'
     ENDVAR_LINE    = '$upscope $end\n'
     ENDDEF_LINE    = '$enddefinitions $end\n'
     
@@ -18,21 +17,28 @@ class VcdLogger(object):
     SIGNAMES  = ['frame','slot','fsm','task','isr','radio','ka','syncPacket','syncAck','debug']
     
     def __new__(cls, *args, **kwargs):
+        if kwargs.get('filename'):
+            # logger writing to its own file, not shared
+            return super(VcdLogger, cls).__new__(cls)
         if not cls._instance:
-            cls._instance = super(VcdLogger, cls).__new__(cls, *args, **kwargs)
+            cls._instance = super(VcdLogger, cls).__new__(cls)
         return cls._instance
     
     #======================== main ============================================
     
-    def __init__(self):
+    def __init__(self,filename=None):
         
         # don't re-initialize an instance (singleton pattern)
         if self._init:
             return
         self._init = True
         
+        # store params
+        self.filename   = filename or self.FILENAME
+        
         # local variables
-        self.f          = open(self.FILENAME,'w')
+        self.swapname   = self.filename+'.swap'
+        self.f          = open(self.filename,'w')
         self.signame    = {}
         self.lastTs     = {}
         self.dataLock   = threading.RLock()
@@ -111,8 +117,8 @@ class VcdLogger(object):
         self.f.close()
         
         #=== FILENAME -> FILENAME_SWAP
-        fswap = open(self.FILENAME_SWAP,'w')
-        for line in open(self.FILENAME,'r'):
+        fswap = open(self.swapname,'w')
+        for line in open(self.filename,'r'):
             # declare variables
             if line==self.ENDVAR_LINE:
                 for signal in self.SIGNAMES:
@@ -133,8 +139,8 @@ class VcdLogger(object):
         fswap.close()
         
         #=== FILENAME_SWAP -> FILENAME
-        os.remove(self.FILENAME)
-        os.rename(self.FILENAME_SWAP, self.FILENAME)
+        os.remove(self.filename)
+        os.rename(self.swapname, self.filename)
         
         #=== re-open FILENAME
-        self.f = open(self.FILENAME,'a')
+        self.f = open(self.filename,'a')
@@ -14,10 +14,10 @@ class IdManager(object):
     The module which assigns ID to the motes.
     '''
     
-    def __init__(self):
+    def __init__(self,engine=None):
         
         # store params
-        self.engine               = SimEngine.SimEngine()
+        self.engine               = engine or SimEngine.SimEngine()
         
         # local variables
         self.currentId            = 0
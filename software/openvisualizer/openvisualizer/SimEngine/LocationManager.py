@@ -15,10 +15,10 @@ class LocationManager(object):
     The module which assigns locations to the motes.
     '''
     
-    def __init__(self):
+    def __init__(self,engine=None):
         
         # store params
-        self.engine               = SimEngine.SimEngine()
+        self.engine               = engine or SimEngine.SimEngine()
         
         # local variables
         
@@ -57,10 +57,10 @@ def notifId(s):
 
 class MoteHandler(threading.Thread):
     
-    def __init__(self,mote):
+    def __init__(self,mote,engine=None):
         
         # store params
-        self.engine          = SimEngine.SimEngine()
+        self.engine          = engine or SimEngine.SimEngine()
         self.mote            = mote
         
         #=== local variables
@@ -23,10 +23,10 @@ class Propagation(eventBusClient.eventBusClient):
     SIGNAL_WIRELESSTXSTART        = 'wirelessTxStart'
     SIGNAL_WIRELESSTXEND          = 'wirelessTxEnd'
     
-    def __init__(self,simTopology):
+    def __init__(self,simTopology,engine=None):
         
         # store params
-        self.engine               = SimEngine.SimEngine()
+        self.engine               = engine or SimEngine.SimEngine()
         self.simTopology          = simTopology
         
         # local variables
@@ -176,6 +176,9 @@ class Propagation(eventBusClient.eventBusClient):
         
         (fromMote,packet,channel) = data
         
+        if not self._isLocalRadio(sender,fromMote):
+            return
+        
         if fromMote in self.connections:
             for (toMote,pdr) in self.connections[fromMote].items():
                 if random.random()<=pdr:
@@ -191,6 +194,9 @@ class Propagation(eventBusClient.eventBusClient):
         
         fromMote = data
         
+        if not self._isLocalRadio(sender,fromMote):
+            return
+        
         if fromMote in self.connections:
             for (toMote,pdr) in self.connections[fromMote].items():
                 try:
@@ -203,5 +209,12 @@ class Propagation(eventBusClient.eventBusClient):
     
     #======================== private =========================================
     
+    def _isLocalRadio(self,sender,fromMote):
+        '''
+        Check the transmission comes from a mote of this engine, since the
+        radios of all engines in the process share the same eventBus.
+        '''
+        return sender==self.engine.getEventBusName('BspRadio_{0}'.format(fromMote))
+    
     #======================== helpers =========================================
     
@@ -38,6 +38,14 @@ class SimEngineStats(object):
 class SimEngine(object):
     '''
     The main simulation engine.
+    
+    By default, ``SimEngine()`` returns the same process-wide instance every
+    time it is called (singleton pattern), which is what OpenVisualizer uses.
+    Passing ``name`` creates an independent engine context instead; all the
+    modules of that simulation (timeline, propagation, mote handlers, BSP
+    emulators) are then handed this engine explicitly rather than looking up
+    the singleton. This allows several simulations to run in the same
+    interpreter, either side by side or back-to-back.
     '''
     
     #======================== singleton pattern ===============================
@@ -46,13 +54,16 @@ class SimEngine(object):
     _init     = False
     
     def __new__(cls, *args, **kwargs):
+        if kwargs.get('name'):
+            # named engine, not shared
+            return super(SimEngine, cls).__new__(cls)
         if not cls._instance:
-            cls._instance = super(SimEngine, cls).__new__(cls, *args, **kwargs)
+            cls._instance = super(SimEngine, cls).__new__(cls)
         return cls._instance
     
     #======================== main ============================================
     
-    def __init__(self,simTopology='',loghandler=logging.NullHandler()):
+    def __init__(self,simTopology='',loghandler=logging.NullHandler(),name=None,vcdLogger=None):
         
         # don't re-initialize an instance (singleton pattern)
         if self._init:
@@ -61,13 +72,15 @@ class SimEngine(object):
         
         # store params
         self.loghandler           = loghandler
+        self.name                 = name
+        self.vcdLogger            = vcdLogger
         
         # local variables
         self.moteHandlers         = []
-        self.timeline             = TimeLine.TimeLine()
-        self.propagation          = Propagation.Propagation(simTopology)
-        self.idmanager            = IdManager.IdManager()
-        self.locationmanager      = LocationManager.LocationManager() 
+        self.timeline             = TimeLine.TimeLine(engine=self)
+        self.propagation          = Propagation.Propagation(simTopology,engine=self)
+        self.idmanager            = IdManager.IdManager(engine=self)
+        self.locationmanager      = LocationManager.LocationManager(engine=self)
         self.pauseSem             = threading.Lock()
         self.isPaused             = False
         self.stopAfterSteps       = None
@@ -191,6 +204,23 @@ class SimEngine(object):
     def getStats(self):
         return self.stats
     
+    def isDefault(self):
+        '''
+        :returns: True if this is the process-wide (singleton) engine.
+        '''
+        return self.name is None
+    
+    def getEventBusName(self,name):
+        '''
+        Scope an eventBus client name to this engine.
+        
+        The names used by the default engine are unchanged, so that existing
+        subscribers keep working.
+        '''
+        if self.isDefault():
+            return name
+        return '{0}.{1}'.format(self.name,name)
+    
     #======================== private =========================================
     
     #======================== helpers =========================================
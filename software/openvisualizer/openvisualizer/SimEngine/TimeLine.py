@@ -37,10 +37,10 @@ class TimeLine(threading.Thread):
     The timeline of the engine.
     '''
     
-    def __init__(self):
+    def __init__(self,engine=None):
         
         # store params
-        self.engine               = SimEngine.SimEngine()
+        self.engine               = engine or SimEngine.SimEngine()
         
         # local variables
         self.currentTime          = 0   # current time
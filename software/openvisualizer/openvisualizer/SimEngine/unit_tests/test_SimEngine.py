@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # SimEngine/
+
+import logging
+import logging.handlers
+
+import pytest
+
+import SimEngine
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_simEngine.log'
+
+import logging
+log = logging.getLogger('test_simEngine')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_simEngine',
+                   'SimEngine',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+#============================ fixtures ========================================
+
+#============================ helpers =========================================
+
+class DummyRadio(object):
+    
+    def __init__(self):
+        self.txStarts = []
+    
+    def indicateTxStart(self,fromMote,packet,channel):
+        self.txStarts += [(fromMote,packet,channel)]
+
+class DummyMoteHandler(object):
+    
+    def __init__(self,engine):
+        self.id       = engine.idmanager.getId()
+        self.bspRadio = DummyRadio()
+    
+    def getId(self):
+        return self.id
+
+#============================ tests ===========================================
+
+def test_singleton():
+    
+    assert SimEngine.SimEngine() is SimEngine.SimEngine()
+    assert SimEngine.SimEngine().isDefault()
+
+def test_namedEngines():
+    
+    default = SimEngine.SimEngine()
+    engineA = SimEngine.SimEngine(name='engineA')
+    engineB = SimEngine.SimEngine(name='engineB')
+    
+    assert engineA is not engineB
+    assert engineA is not default
+    assert not engineA.isDefault()
+    
+    # each engine hands itself to its modules
+    for e in [engineA,engineB]:
+        assert e.timeline.engine        is e
+        assert e.propagation.engine     is e
+        assert e.idmanager.engine       is e
+        assert e.locationmanager.engine is e
+    
+    # each engine assigns its own mote IDs
+    assert engineA.idmanager.getId()==1
+    assert engineB.idmanager.getId()==1
+    
+    # eventBus names are scoped to named engines only
+    assert default.getEventBusName('BspRadio_1')=='BspRadio_1'
+    assert engineA.getEventBusName('BspRadio_1')=='engineA.BspRadio_1'
+
+def test_propagationIsolation():
+    '''
+    Two engines with a mote of the same ID: a transmission in one engine must
+    not be received by the motes of the other.
+    '''
+    
+    engines = []
+    for name in ['isoA','isoB']:
+        e = SimEngine.SimEngine('fully-meshed',name=name)
+        for _ in range(2):
+            e.indicateNewMote(DummyMoteHandler(e))
+        engines += [e]
+    (engineA,engineB) = engines
+    
+    engineA.propagation.dispatch(
+        signal          = 'wirelessTxStart',
+        data            = (1,[0x01,0x02],11),
+    )
+    
+    # not sent by a radio of either engine
+    for e in engines:
+        assert e.getMoteHandlerById(2).bspRadio.txStarts==[]
+    
+    engineA.propagation._indicateTxStart(
+        sender          = engineA.getEventBusName('BspRadio_1'),
+        signal          = 'wirelessTxStart',
+        data            = (1,[0x01,0x02],11),
+    )
+    engineB.propagation._indicateTxStart(
+        sender          = engineA.getEventBusName('BspRadio_1'),
+        signal          = 'wirelessTxStart',
+        data            = (1,[0x01,0x02],11),
+    )
+    
+    assert engineA.getMoteHandlerById(2).bspRadio.txStarts==[(1,[0x01,0x02],11)]
+    assert engineB.getMoteHandlerById(2).bspRadio.txStarts==[]
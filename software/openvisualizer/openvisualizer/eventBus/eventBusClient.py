@@ -13,6 +13,8 @@ import Queue
 
 from pydispatch import dispatcher
 
+import eventBusStats
+
 class eventBusClient(object):
     
     WILDCARD  = '*'
@@ -62,6 +64,13 @@ class eventBusClient(object):
     #======================== public ==========================================
     
     def dispatch(self,signal,data):
+        stats = eventBusStats.eventBusStats._instance
+        if stats and stats.enabled:
+            return stats.dispatch(
+                self.name,
+                signal,
+                lambda: dispatcher.send(sender=self.name,signal=signal,data=data),
+            )
         return dispatcher.send(
             sender = self.name,
             signal = signal,
@@ -120,7 +129,8 @@ class eventBusClient(object):
                         self._signalsEquivalent(r['signal'],signal) and
                         (r['sender']==sender or r['sender']==self.WILDCARD)
                     ):
-                    callback = r['callback']
+                    callback  = r['callback']
+                    regSignal = r['signal']
                     break
         
         if not callback:
@@ -128,6 +138,9 @@ class eventBusClient(object):
         
         # call the callback
         try:
+            stats = eventBusStats.eventBusStats._instance
+            if stats and stats.enabled:
+                return stats.callAndRecord(self.name,regSignal,callback,sender,signal,data)
             return callback(
                 sender = sender,
                 signal = signal,
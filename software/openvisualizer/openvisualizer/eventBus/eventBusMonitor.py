@@ -12,11 +12,13 @@ import threading
 import copy
 import json
 import binascii
+import time
 
 import openvisualizer.openvisualizer_utils as u
 
 from pydispatch import dispatcher
 from openvisualizer.openTun    import openTun
+from openvisualizer.eventBus   import pcapngWriter
 
 class eventBusMonitor(object):
     
@@ -33,6 +35,7 @@ class eventBusMonitor(object):
         self.wiresharkDebugEnabled     = False
         self.dagRootEui64              = [0x00]*8
         self.simMode                   = False
+        self.pcapWriter                = None
         
         # give this instance a name
         self.name                      = 'eventBusMonitor'
@@ -74,6 +77,13 @@ class eventBusMonitor(object):
         log.info('%s export of ZEP mesh debug packets to Internet',
                 'Enabled' if self.wiresharkDebugEnabled else 'Disabled')
     
+    def setPcapWriter(self,writer):
+        '''
+        Sets the pcapngWriter the mesh debug packets are written to, in
+        addition to (and independently of) the ZEP export. None to stop.
+        '''
+        self.pcapWriter = writer
+    
     #======================== private =========================================
     
     def _eventBusNotification(self,signal,sender,data):
@@ -94,6 +104,9 @@ class eventBusMonitor(object):
             # this signal only exists is simulation mode
             self.simMode = True
         
+        if self.pcapWriter:
+            self._writePcap(signal,sender,data)
+        
         if self.wiresharkDebugEnabled:
             
             if self.simMode:
@@ -164,10 +177,62 @@ class eventBusMonitor(object):
         
         
         
-    def _wrapMacAndZep(self, previousHop, nextHop, lowpan):
+    def _writePcap(self,signal,sender,data):
         '''
-        Returns Exegin ZEP protocol header and dummy 802.15.4 header 
-        wrapped around outgoing 6LoWPAN layer packet.
+        Queues a copy of the frame carried by a signal to the pcapngWriter,
+        one interface per mote. Frames exchanged between simulated motes are
+        timestamped with the simulated time.
+        '''
+        
+        if self.simMode:
+            
+            if signal=='wirelessTxStart':
+                from openvisualizer.SimEngine import SimEngine
+                
+                (moteId,frame,channel) = data
+                self.pcapWriter.writePacket(
+                    interface     = 'mote {0}'.format(moteId),
+                    timestamp     = SimEngine.SimEngine().timeline.getCurrentTime(),
+                    frame         = frame[1:],   # without the length byte
+                    channel       = channel,
+                    hasFcs        = True,
+                    direction     = pcapngWriter.DIRECTION_OUTBOUND,
+                )
+        
+        else:
+            
+            if signal=='fromMote.data':
+                (previousHop,lowpan) = data
+                self.pcapWriter.writePacket(
+                    interface     = sender.split('@')[-1],
+                    timestamp     = time.time(),
+                    frame         = self._wrapMac(previousHop,self.dagRootEui64,lowpan),
+                    direction     = pcapngWriter.DIRECTION_INBOUND,
+                )
+            
+            elif signal=='fromMote.sniffedPacket':
+                self.pcapWriter.writePacket(
+                    interface     = sender.split('@')[-1],
+                    timestamp     = time.time(),
+                    frame         = data[:-1],   # without the channel
+                    channel       = data[-1],
+                    hasFcs        = True,
+                    direction     = pcapngWriter.DIRECTION_INBOUND,
+                )
+            
+            elif signal=='bytesToMesh':
+                (nextHop,lowpan) = data
+                self.pcapWriter.writePacket(
+                    interface     = 'to mesh',
+                    timestamp     = time.time(),
+                    frame         = self._wrapMac(self.dagRootEui64,nextHop,lowpan),
+                    direction     = pcapngWriter.DIRECTION_OUTBOUND,
+                )
+    
+    def _wrapMac(self, previousHop, nextHop, lowpan):
+        '''
+        Returns a dummy 802.15.4 header, without CRC, wrapped around a 6LoWPAN
+        layer packet.
         '''
         
         phop   = previousHop[:]
@@ -175,6 +240,21 @@ class eventBusMonitor(object):
         nhop   = nextHop[:]
         nhop.reverse()
         
+        mac    = [0x41,0xcc]           # frame control
+        mac   += [0x66]                # sequence number
+        mac   += [0xfe,0xca]           # destination PAN ID
+        mac   += nhop                  # destination address
+        mac   += phop                  # source address
+        mac   += lowpan
+        
+        return mac
+    
+    def _wrapMacAndZep(self, previousHop, nextHop, lowpan):
+        '''
+        Returns Exegin ZEP protocol header and dummy 802.15.4 header 
+        wrapped around outgoing 6LoWPAN layer packet.
+        '''
+        
         # ZEP
         zep    = [ord('E'),ord('X')]   # Protocol ID String
         zep   += [0x02]                # Protocol Version
@@ -189,12 +269,7 @@ class eventBusMonitor(object):
         zep   += [21+len(lowpan)+2]    # length
         
         # IEEE802.15.4                 (data frame with dummy values)
-        mac    = [0x41,0xcc]           # frame control
-        mac   += [0x66]                # sequence number
-        mac   += [0xfe,0xca]           # destination PAN ID
-        mac   += nhop                  # destination address
-        mac   += phop                  # source address
-        mac   += lowpan
+        mac    = self._wrapMac(previousHop,nextHop,lowpan)
         # CRC
         mac   += u.calculateFCS(mac)
         
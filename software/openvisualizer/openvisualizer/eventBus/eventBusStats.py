@@ -0,0 +1,290 @@
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+'''
+Optional instrumentation of the event bus.
+
+When enabled, every call of an eventBusClient callback is timed, and its
+latency recorded in a histogram per (signal, callback). In addition, one
+dispatch out of ``traceSampling`` is traced: the dispatches and callbacks it
+triggers in the same thread (e.g. the ``v6ToInternet`` dispatched by OpenLbr
+while handling a ``fromMote.data``) are recorded under the same trace ID,
+with their time offset and duration.
+'''
+import logging
+log = logging.getLogger('eventBusStats')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import array
+import collections
+import itertools
+import threading
+import time
+
+#============================ histogram =======================================
+
+class LatencyHistogram(object):
+    '''
+    Histogram of latencies, in microseconds, with a constant memory footprint.
+    
+    As in HDR histograms, the buckets are exact below ``2**SUB_BITS`` us,
+    then each power of 2 is split in ``2**(SUB_BITS-1)`` buckets, so a value
+    is known within ``2**-(SUB_BITS-1)`` (12.5%) of its value. Values above
+    ``2**MAX_BITS`` us (about 1 hour) are counted in the last bucket.
+    '''
+    
+    SUB_BITS       = 4
+    MAX_BITS       = 32
+    SUB_COUNT      = 1<<SUB_BITS
+    HALF_COUNT     = 1<<(SUB_BITS-1)
+    NUM_BUCKETS    = SUB_COUNT+(MAX_BITS-SUB_BITS)*HALF_COUNT
+    
+    __slots__ = ['counts','count','total','min','max']
+    
+    def __init__(self):
+        self.counts               = array.array('I',[0])*self.NUM_BUCKETS
+        self.count                = 0
+        self.total                = 0
+        self.min                  = None
+        self.max                  = None
+    
+    #======================== public ==========================================
+    
+    def record(self,us):
+        us = int(us)
+        if us<0:
+            us = 0
+        self.counts[self._bucket(us)] += 1
+        self.count               += 1
+        self.total               += us
+        if self.min is None or us<self.min:
+            self.min              = us
+        if self.max is None or us>self.max:
+            self.max              = us
+    
+    def percentile(self,p):
+        '''
+        :returns: The p-th percentile (0<p<=100), in us, None if empty. The
+                  value returned is the highest value of its bucket, capped
+                  by the largest value recorded.
+        '''
+        if not self.count:
+            return None
+        threshold  = p/100.0*self.count
+        cumulative = 0
+        for (bucket,num) in enumerate(self.counts):
+            cumulative += num
+            if num and cumulative>=threshold:
+                return min(self._highestValue(bucket),self.max)
+        return self.max
+    
+    def toDict(self):
+        '''
+        :returns: The statistics of the histogram, in milliseconds.
+        '''
+        returnVal = {
+            'count':     self.count,
+            'meanMs':    None,
+            'minMs':     None,
+            'maxMs':     None,
+        }
+        if self.count:
+            returnVal['meanMs']  = self.total/1000.0/self.count
+            returnVal['minMs']   = self.min/1000.0
+            returnVal['maxMs']   = self.max/1000.0
+        for p in [50,90,99]:
+            value = self.percentile(p)
+            returnVal['p{0}Ms'.format(p)] = None if value is None else value/1000.0
+        return returnVal
+    
+    #======================== private =========================================
+    
+    def _bucket(self,us):
+        if us<self.SUB_COUNT:
+            return us
+        shift = us.bit_length()-self.SUB_BITS
+        if shift>=self.MAX_BITS-self.SUB_BITS:
+            return self.NUM_BUCKETS-1
+        return self.SUB_COUNT+(shift-1)*self.HALF_COUNT+((us>>shift)-self.HALF_COUNT)
+    
+    def _highestValue(self,bucket):
+        if bucket<self.SUB_COUNT:
+            return bucket
+        shift = (bucket-self.SUB_COUNT)//self.HALF_COUNT+1
+        sub   = (bucket-self.SUB_COUNT)%self.HALF_COUNT+self.HALF_COUNT
+        return ((sub+1)<<shift)-1
+
+#============================ class ===========================================
+
+class eventBusStats(object):
+    '''
+    Collects the latency histograms and traces of the event bus.
+    
+    Instrumentation is off until enable() is called; the eventBusClients then
+    report to this instance through dispatch() and callAndRecord().
+    
+    There is a single instance of this class (singleton pattern).
+    '''
+    
+    TRACE_SAMPLING        = 100     # trace one dispatch out of
+    MAX_TRACES            = 100
+    MAX_EVENTS_PER_TRACE  = 64
+    
+    #======================== singleton pattern ===============================
+    
+    _instance = None
+    _init     = False
+    
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super(eventBusStats, cls).__new__(cls)
+        return cls._instance
+    
+    #======================== main ============================================
+    
+    def __init__(self,traceSampling=TRACE_SAMPLING):
+        
+        # don't re-initialize an instance (singleton pattern)
+        if self._init:
+            return
+        self._init = True
+        
+        # log
+        log.info("create instance")
+        
+        # store params
+        self.traceSampling        = traceSampling
+        
+        # local variables
+        self.dataLock             = threading.Lock()
+        self.enabled              = False
+        self.histograms           = {}  # (signal,callback) -> LatencyHistogram
+        self.traces               = collections.deque(maxlen=self.MAX_TRACES)
+        self.numDispatches        = 0
+        self.traceIds             = itertools.count(1)
+        self.local                = threading.local()
+    
+    #======================== public ==========================================
+    
+    def enable(self,enabled=True):
+        self.enabled = enabled
+        log.info('{0} event bus instrumentation'.format('Enabled' if enabled else 'Disabled'))
+    
+    def setTraceSampling(self,traceSampling):
+        '''
+        :param traceSampling: Trace one dispatch out of traceSampling, 0 to
+                              disable tracing.
+        '''
+        with self.dataLock:
+            self.traceSampling = traceSampling
+    
+    def dispatch(self,sender,signal,send):
+        '''
+        Calls ``send()``, the dispatch of a signal, tracing it if sampled or
+        part of a trace.
+        '''
+        trace = getattr(self.local,'trace',None)
+        
+        if trace is None:
+            # not part of a trace, sample
+            with self.dataLock:
+                self.numDispatches += 1
+                sampled = self.traceSampling and self.numDispatches%self.traceSampling==0
+            if not sampled:
+                return send()
+            trace = {
+                'id':         next(self.traceIds),
+                'startTime':  time.time(),
+                'events':     [],
+            }
+            self.local.trace = trace
+            self._addTraceEvent(trace,'dispatch',sender,signal,None)
+            try:
+                return send()
+            finally:
+                self.local.trace = None
+                trace['durationMs'] = (time.time()-trace['startTime'])*1000
+                with self.dataLock:
+                    self.traces.append(trace)
+        else:
+            self._addTraceEvent(trace,'dispatch',sender,signal,None)
+            return send()
+    
+    def callAndRecord(self,clientName,regSignal,callback,sender,signal,data):
+        '''
+        Calls an eventBusClient callback, recording its latency.
+        
+        :param regSignal: The signal the callback is registered for, which
+                          identifies the histogram together with the callback.
+        '''
+        name      = '{0}.{1}'.format(clientName,getattr(callback,'__name__',callback))
+        trace     = getattr(self.local,'trace',None)
+        event     = None
+        if trace is not None:
+            event = self._addTraceEvent(trace,'call',sender,signal,name)
+        
+        startTime = time.time()
+        try:
+            return callback(
+                sender = sender,
+                signal = signal,
+                data   = data,
+            )
+        finally:
+            duration = time.time()-startTime
+            key      = (str(regSignal),name)
+            with self.dataLock:
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = LatencyHistogram()
+                    self.histograms[key] = histogram
+                histogram.record(duration*1000000)
+            if event is not None:
+                event['durationMs'] = duration*1000
+    
+    def getStats(self):
+        '''
+        :returns: A list with the call count and latency statistics of each
+                  (signal, callback), slowest (p99) first.
+        '''
+        with self.dataLock:
+            items = self.histograms.items()
+            stats = []
+            for ((signal,callback),histogram) in items:
+                s = histogram.toDict()
+                s['signal']   = signal
+                s['callback'] = callback
+                stats.append(s)
+        stats.sort(key=lambda s: s['p99Ms'],reverse=True)
+        return stats
+    
+    def getTraces(self):
+        with self.dataLock:
+            return list(self.traces)
+    
+    def clear(self):
+        with self.dataLock:
+            self.histograms = {}
+            self.traces.clear()
+    
+    #======================== private =========================================
+    
+    def _addTraceEvent(self,trace,type,sender,signal,callback):
+        '''
+        :returns: The event added to the trace, None if the trace is full.
+        '''
+        if len(trace['events'])>=self.MAX_EVENTS_PER_TRACE:
+            return None
+        event = {
+            'type':         type,
+            'offsetMs':     (time.time()-trace['startTime'])*1000,
+            'durationMs':   None,
+            'sender':       sender,
+            'signal':       str(signal),
+            'callback':     callback,
+        }
+        trace['events'].append(event)
+        return event
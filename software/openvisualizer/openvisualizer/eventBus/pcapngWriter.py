@@ -0,0 +1,252 @@
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+'''
+Writes IEEE802.15.4 frames into pcapng files, readable by Wireshark.
+
+Frames are written with the IEEE802.15.4 TAP link type, which carries the
+channel and whether the frame ends with an FCS, so no FCS has to be computed
+for frames without one. Each mote (or any other source of frames) gets its
+own interface in the file.
+
+Writing happens in a background thread: writePacket() only queues the frame,
+and drops it if the queue is full, so capturing never slows down its caller.
+When a file reaches ``maxBytes``, the capture continues in a new file, and
+only the last ``maxFiles`` files are kept.
+'''
+import logging
+log = logging.getLogger('pcapngWriter')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import os
+import struct
+import sys
+import threading
+import Queue
+
+import openvisualizer.openvisualizer_utils as u
+
+#============================ defines =========================================
+
+BLOCK_SHB                 = 0x0A0D0D0A
+BLOCK_IDB                 = 0x00000001
+BLOCK_EPB                 = 0x00000006
+BYTE_ORDER_MAGIC          = 0x1A2B3C4D
+
+OPT_ENDOFOPT              = 0
+OPT_SHB_USERAPPL          = 4
+OPT_IF_NAME               = 2
+OPT_EPB_FLAGS             = 2
+
+LINKTYPE_IEEE802_15_4_TAP = 283
+TAP_TLV_FCS_TYPE          = 0
+TAP_TLV_CHANNEL           = 3
+TAP_FCS_NONE              = 0
+TAP_FCS_16BIT             = 1
+
+DIRECTION_UNKNOWN         = 0
+DIRECTION_INBOUND         = 1
+DIRECTION_OUTBOUND        = 2
+
+SNAPLEN                   = 0xffff
+
+#============================ helpers =========================================
+
+def _options(options):
+    '''
+    :param options: List of (code,value) tuples, value being a string.
+    '''
+    output = []
+    for (code,value) in options:
+        output += [struct.pack('<HH',code,len(value)),value,'\x00'*(-len(value)%4)]
+    output += [struct.pack('<HH',OPT_ENDOFOPT,0)]
+    return ''.join(output)
+
+def _block(type,body):
+    length = 12+len(body)
+    return struct.pack('<II',type,length)+body+struct.pack('<I',length)
+
+#============================ class ===========================================
+
+class PcapngWriter(threading.Thread):
+    
+    MAX_BYTES          = 100*1024*1024
+    MAX_FILES          = 10
+    MAX_QUEUE          = 10000
+    
+    def __init__(self,filename,maxBytes=MAX_BYTES,maxFiles=MAX_FILES):
+        '''
+        :param filename: Name of the first file; the following ones are
+                         numbered, e.g. 'mesh_00001.pcapng' after
+                         'mesh.pcapng'.
+        :param maxBytes: Size at which a new file is started, 0 for never.
+        :param maxFiles: Number of files kept, 0 for all.
+        '''
+        
+        # log
+        log.info("creating instance")
+        
+        # store params
+        self.filename             = filename
+        self.maxBytes             = maxBytes
+        self.maxFiles             = maxFiles
+        
+        # local variables
+        self.queue                = Queue.Queue(maxsize=self.MAX_QUEUE)
+        self.interfaces           = []  # interface names, index is the interface ID
+        self.interfaceIds         = {}  # interface name -> interface ID
+        self.file                 = None
+        self.fileIndex            = -1
+        self.fileBytes            = 0
+        self.numWritten           = 0
+        self.numDropped           = 0
+        
+        # initialize the parent class
+        threading.Thread.__init__(self)
+        
+        # give this thread a name
+        self.name                 = 'pcapngWriter'
+        self.daemon               = True
+        
+        self._openNextFile()
+        
+        # start myself
+        self.start()
+    
+    #======================== thread ==========================================
+    
+    def run(self):
+        try:
+            # log
+            log.info("start running")
+            
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    break
+                self._writePacket(*item)
+                if self.queue.empty():
+                    # idle, make the packets written so far visible
+                    self.file.flush()
+            
+            self.file.close()
+        
+        except Exception as err:
+            errMsg=u.formatCrashMessage(self.name,err)
+            print errMsg
+            log.critical(errMsg)
+            sys.exit(-1)
+    
+    #======================== public ==========================================
+    
+    def writePacket(self,interface,timestamp,frame,channel=None,hasFcs=False,direction=DIRECTION_UNKNOWN):
+        '''
+        Queues a frame to be written.
+        
+        :param interface: Name of the interface the frame was captured on,
+                          e.g. the serial port of a mote.
+        :param timestamp: Time of the frame, in seconds since the epoch.
+        :param frame:     The IEEE802.15.4 frame, as a string or a list of
+                          bytes.
+        :param channel:   The channel of the frame, None if unknown.
+        :param hasFcs:    Whether the frame ends with its 2-byte FCS.
+        :param direction: One of the DIRECTION_* constants.
+        :returns: False if the frame was dropped because the writer is
+                  overloaded.
+        '''
+        try:
+            self.queue.put_nowait((interface,timestamp,frame,channel,hasFcs,direction))
+        except Queue.Full:
+            self.numDropped += 1
+            return False
+        return True
+    
+    def getStats(self):
+        return {
+            'filename':       self._fileName(self.fileIndex),
+            'numWritten':     self.numWritten,
+            'numDropped':     self.numDropped,
+            'queueDepth':     self.queue.qsize(),
+        }
+    
+    def close(self):
+        '''
+        Writes the frames queued so far, then closes the file.
+        '''
+        self.queue.put(None)
+        self.join()
+    
+    #======================== private =========================================
+    
+    def _writePacket(self,interface,timestamp,frame,channel,hasFcs,direction):
+        
+        interfaceId = self.interfaceIds.get(interface)
+        if interfaceId is None:
+            interfaceId = len(self.interfaces)
+            self.interfaces.append(interface)
+            self.interfaceIds[interface] = interfaceId
+            self._write(self._interfaceBlock(interface))
+        
+        if not isinstance(frame,str):
+            frame   = str(bytearray(frame))
+        
+        # TAP header
+        tlvs        = struct.pack('<HHB3x',TAP_TLV_FCS_TYPE,1,TAP_FCS_16BIT if hasFcs else TAP_FCS_NONE)
+        if channel is not None:
+            tlvs   += struct.pack('<HHHBx',TAP_TLV_CHANNEL,3,channel,0)
+        data        = struct.pack('<BBH',0,0,4+len(tlvs))+tlvs+frame
+        
+        us          = int(round(timestamp*1000000))
+        body        = struct.pack('<IIIII',interfaceId,us>>32,us & 0xffffffff,len(data),len(data))
+        body       += data+'\x00'*(-len(data)%4)
+        body       += _options([(OPT_EPB_FLAGS,struct.pack('<I',direction))] if direction else [])
+        self._write(_block(BLOCK_EPB,body))
+        
+        self.numWritten += 1
+        
+        if self.maxBytes and self.fileBytes>=self.maxBytes:
+            self._openNextFile()
+    
+    def _write(self,block):
+        self.file.write(block)
+        self.fileBytes += len(block)
+    
+    def _openNextFile(self):
+        if self.file:
+            self.file.close()
+        
+        self.fileIndex += 1
+        self.file       = open(self._fileName(self.fileIndex),'wb',64*1024)
+        self.fileBytes  = 0
+        
+        # section header, then the interfaces already known, with the same IDs
+        self._write(_block(
+            BLOCK_SHB,
+            struct.pack('<IHHq',BYTE_ORDER_MAGIC,1,0,-1)+_options([(OPT_SHB_USERAPPL,'OpenVisualizer')]),
+        ))
+        for interface in self.interfaces:
+            self._write(self._interfaceBlock(interface))
+        
+        # remove the oldest file
+        if self.maxFiles and self.fileIndex>=self.maxFiles:
+            try:
+                os.remove(self._fileName(self.fileIndex-self.maxFiles))
+            except OSError as err:
+                log.warning('could not remove old capture file: {0}'.format(err))
+        
+        log.info('writing {0}'.format(self._fileName(self.fileIndex)))
+    
+    def _interfaceBlock(self,interface):
+        return _block(
+            BLOCK_IDB,
+            struct.pack('<HHI',LINKTYPE_IEEE802_15_4_TAP,0,SNAPLEN)+_options([(OPT_IF_NAME,str(interface))]),
+        )
+    
+    def _fileName(self,index):
+        if index==0:
+            return self.filename
+        (root,ext) = os.path.splitext(self.filename)
+        return '{0}_{1:05d}{2}'.format(root,index,ext)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))               # root/
+sys.path.insert(0, os.path.join(here, '..'))                           # eventBus/
+
+import random
+
+import pytest
+
+import eventBusClient
+import eventBusStats
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_eventBusStats.log'
+
+import logging
+log = logging.getLogger('test_eventBusStats')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  maxBytes=2*1024*1024,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in   [
+                        'test_eventBusStats',
+                        'eventBusStats',
+                    ]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ helpers =========================================
+
+class Forwarder(eventBusClient.eventBusClient):
+    '''
+    Handles 'testStats.in' by dispatching 'testStats.out'.
+    '''
+    def __init__(self):
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name                  = 'Forwarder',
+            registrations         = [
+                {
+                    'sender'      : self.WILDCARD,
+                    'signal'      : 'testStats.in',
+                    'callback'    : self._in_notif,
+                },
+            ]
+        )
+    
+    def _in_notif(self,sender,signal,data):
+        self.dispatch('testStats.out',data)
+
+class Sink(eventBusClient.eventBusClient):
+    def __init__(self):
+        self.received = []
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name                  = 'Sink',
+            registrations         = [
+                {
+                    'sender'      : self.WILDCARD,
+                    'signal'      : 'testStats.out',
+                    'callback'    : self._out_notif,
+                },
+            ]
+        )
+    
+    def _out_notif(self,sender,signal,data):
+        self.received.append(data)
+
+@pytest.fixture
+def stats():
+    stats = eventBusStats.eventBusStats()
+    stats.clear()
+    stats.enable()
+    yield stats
+    stats.enable(False)
+    stats.clear()
+
+#============================ tests ===========================================
+
+def test_histogramPrecision():
+    
+    histogram = eventBusStats.LatencyHistogram()
+    for us in range(16):
+        assert histogram._highestValue(histogram._bucket(us))==us
+    
+    for _ in range(10000):
+        us     = random.randint(0,1<<31)
+        bucket = histogram._bucket(us)
+        assert 0<=bucket<histogram.NUM_BUCKETS
+        high   = histogram._highestValue(bucket)
+        assert us<=high<=us*1.125+1
+
+def test_histogramPercentiles():
+    
+    histogram = eventBusStats.LatencyHistogram()
+    for us in range(1,1001):
+        histogram.record(us)
+    histogram.record(10**10)
+    
+    stats = histogram.toDict()
+    assert stats['count']==1001
+    assert stats['minMs']==0.001
+    assert stats['maxMs']==10**7
+    assert 0.5<=stats['p50Ms']<=0.5*1.125
+    assert 0.99<=stats['p99Ms']<=0.99*1.125
+    assert len(histogram.counts)==histogram.NUM_BUCKETS
+
+def test_callLatencyAndTrace(stats):
+    
+    stats.setTraceSampling(1)
+    source = eventBusClient.eventBusClient('Source',[])
+    Forwarder()
+    sink   = Sink()
+    
+    source.dispatch('testStats.in','packet')
+    assert sink.received==['packet']
+    
+    byKey  = dict(((s['signal'],s['callback']),s) for s in stats.getStats())
+    assert byKey[('testStats.in','Forwarder._in_notif')]['count']==1
+    assert byKey[('testStats.out','Sink._out_notif')]['count']==1
+    
+    # the trace follows the packet from 'testStats.in' to the Sink
+    trace  = stats.getTraces()[-1]
+    events = [(e['type'],e['signal'],e['callback']) for e in trace['events']]
+    assert events==[
+        ('dispatch','testStats.in', None),
+        ('call',    'testStats.in', 'Forwarder._in_notif'),
+        ('dispatch','testStats.out',None),
+        ('call',    'testStats.out','Sink._out_notif'),
+    ]
+    assert trace['durationMs']>=0
+
+def test_traceSampling(stats):
+    
+    stats.setTraceSampling(10)
+    source = eventBusClient.eventBusClient('Source',[])
+    for _ in range(100):
+        source.dispatch('testStats.sampled',None)
+    assert len(stats.getTraces())==10
+    
+    stats.setTraceSampling(0)
+    source.dispatch('testStats.sampled',None)
+    assert len(stats.getTraces())==10
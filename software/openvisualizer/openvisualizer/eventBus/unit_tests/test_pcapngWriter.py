@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))               # root/
+sys.path.insert(0, os.path.join(here, '..'))                           # eventBus/
+
+import struct
+
+from pydispatch import dispatcher
+
+import pcapngWriter
+import eventBusMonitor
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_pcapngWriter.log'
+
+import logging
+log = logging.getLogger('test_pcapngWriter')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  maxBytes=2*1024*1024,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in   [
+                        'test_pcapngWriter',
+                        'pcapngWriter',
+                    ]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ helpers =========================================
+
+def readBlocks(filename):
+    '''
+    :returns: The list of (type,body) of the blocks of a pcapng file.
+    '''
+    with open(filename,'rb') as f:
+        content = f.read()
+    blocks = []
+    while content:
+        (type,length) = struct.unpack('<II',content[:8])
+        assert length%4==0
+        assert struct.unpack('<I',content[length-4:length])[0]==length
+        blocks.append((type,content[8:length-4]))
+        content = content[length:]
+    return blocks
+
+def readOptions(data):
+    options = {}
+    while True:
+        (code,length) = struct.unpack('<HH',data[:4])
+        if code==pcapngWriter.OPT_ENDOFOPT:
+            return options
+        options[code] = data[4:4+length]
+        data = data[4+length+(-length%4):]
+
+def readPackets(filename):
+    '''
+    :returns: The list of interface names and the list of packets of a
+              pcapng file, each packet a dict.
+    '''
+    blocks = readBlocks(filename)
+    
+    (type,body) = blocks[0]
+    assert type==pcapngWriter.BLOCK_SHB
+    assert struct.unpack('<IHH',body[:8])==(pcapngWriter.BYTE_ORDER_MAGIC,1,0)
+    
+    interfaces = []
+    packets    = []
+    for (type,body) in blocks[1:]:
+        if type==pcapngWriter.BLOCK_IDB:
+            (linktype,_,_) = struct.unpack('<HHI',body[:8])
+            assert linktype==pcapngWriter.LINKTYPE_IEEE802_15_4_TAP
+            interfaces.append(readOptions(body[8:])[pcapngWriter.OPT_IF_NAME])
+        elif type==pcapngWriter.BLOCK_EPB:
+            (ifId,tsHigh,tsLow,capLen,origLen) = struct.unpack('<IIIII',body[:20])
+            assert ifId<len(interfaces)
+            data      = body[20:20+capLen]
+            options   = readOptions(body[20+capLen+(-capLen%4):])
+            
+            # TAP header and TLVs
+            (_,_,tapLen) = struct.unpack('<BBH',data[:4])
+            tlvs      = {}
+            tlvData   = data[4:tapLen]
+            while tlvData:
+                (tlvType,tlvLen) = struct.unpack('<HH',tlvData[:4])
+                tlvs[tlvType] = tlvData[4:4+tlvLen]
+                tlvData = tlvData[4+tlvLen+(-tlvLen%4):]
+            
+            packets.append({
+                'interface':  interfaces[ifId],
+                'timestamp':  ((tsHigh<<32)+tsLow)/1000000.0,
+                'frame':      [ord(b) for b in data[tapLen:]],
+                'hasFcs':     ord(tlvs[pcapngWriter.TAP_TLV_FCS_TYPE])==pcapngWriter.TAP_FCS_16BIT,
+                'channel':    struct.unpack('<H',tlvs[pcapngWriter.TAP_TLV_CHANNEL][:2])[0] if pcapngWriter.TAP_TLV_CHANNEL in tlvs else None,
+                'direction':  struct.unpack('<I',options[pcapngWriter.OPT_EPB_FLAGS])[0] if pcapngWriter.OPT_EPB_FLAGS in options else 0,
+            })
+        else:
+            assert False, 'unexpected block type {0}'.format(type)
+    
+    return (interfaces,packets)
+
+#============================ tests ===========================================
+
+def test_writePackets(tmpdir):
+    
+    filename = str(tmpdir.join('mesh.pcapng'))
+    writer   = pcapngWriter.PcapngWriter(filename)
+    writer.writePacket('mote 1',1000.5,[0x41,0xcc,0x01],channel=26,hasFcs=True)
+    writer.writePacket('mote 2',1001.25,'\x41\xcc\x02\x03\x04')
+    writer.writePacket('mote 1',1002,[0x41],direction=pcapngWriter.DIRECTION_INBOUND)
+    writer.close()
+    
+    (interfaces,packets) = readPackets(filename)
+    assert interfaces==['mote 1','mote 2']
+    assert [p['interface'] for p in packets]==['mote 1','mote 2','mote 1']
+    assert [p['timestamp'] for p in packets]==[1000.5,1001.25,1002]
+    assert [p['frame'] for p in packets]==[[0x41,0xcc,0x01],[0x41,0xcc,0x02,0x03,0x04],[0x41]]
+    assert [p['channel'] for p in packets]==[26,None,None]
+    assert [p['hasFcs'] for p in packets]==[True,False,False]
+    assert [p['direction'] for p in packets]==[0,0,pcapngWriter.DIRECTION_INBOUND]
+    assert writer.getStats()['numWritten']==3
+
+def test_rotation(tmpdir):
+    
+    filename = str(tmpdir.join('mesh.pcapng'))
+    writer   = pcapngWriter.PcapngWriter(filename,maxBytes=1000,maxFiles=3)
+    for i in range(100):
+        writer.writePacket('mote {0}'.format(i%2),i,[i]*50,channel=11+i%16)
+    writer.close()
+    
+    # only the last 3 files are left, each one readable on its own
+    names = sorted(os.listdir(str(tmpdir)))
+    assert len(names)==3
+    assert 'mesh.pcapng' not in names
+    
+    timestamps = []
+    for name in names:
+        (interfaces,packets) = readPackets(str(tmpdir.join(name)))
+        assert interfaces==['mote 0','mote 1']
+        for p in packets:
+            assert p['interface']=='mote {0}'.format(p['frame'][0]%2)
+            assert p['channel']==11+p['frame'][0]%16
+        timestamps += [p['timestamp'] for p in packets]
+    assert timestamps==range(100-len(timestamps),100)
+
+def test_dropWhenFull(tmpdir):
+    
+    writer   = pcapngWriter.PcapngWriter(str(tmpdir.join('mesh.pcapng')))
+    writer.queue.maxsize = 1
+    writer.queue.mutex.acquire() # keep the writer thread from emptying the queue
+    try:
+        writer.queue.queue.append(('mote 1',0,[0x41],None,False,0))
+        assert writer.writePacket('mote 1',0,[0x41])==False
+    finally:
+        writer.queue.mutex.release()
+    assert writer.getStats()['numDropped']==1
+    writer.close()
+
+def test_monitorWritesMeshPackets(tmpdir):
+    
+    filename = str(tmpdir.join('mesh.pcapng'))
+    writer   = pcapngWriter.PcapngWriter(filename)
+    monitor  = eventBusMonitor.eventBusMonitor()
+    monitor.setPcapWriter(writer)
+    
+    eui64    = [0x00,0x12,0x4b,0x00,0x01,0x02,0x03,0x04]
+    dispatcher.send(
+        sender = 'moteConnector@/dev/ttyUSB0',
+        signal = 'fromMote.data',
+        data   = (eui64,[0x78,0x01]),
+    )
+    dispatcher.send(
+        sender = 'moteConnector@/dev/ttyUSB1',
+        signal = 'fromMote.sniffedPacket',
+        data   = [0x41,0xcc,0x07,0xaa,0xbb,20],
+    )
+    monitor.setPcapWriter(None)
+    writer.close()
+    
+    (interfaces,packets) = readPackets(filename)
+    assert interfaces==['/dev/ttyUSB0','/dev/ttyUSB1']
+    
+    # 6LoWPAN packet from a mote, in a dummy MAC header
+    assert packets[0]['frame']==[0x41,0xcc,0x66,0xfe,0xca]+[0x00]*8+eui64[::-1]+[0x78,0x01]
+    assert packets[0]['hasFcs']==False
+    assert packets[0]['direction']==pcapngWriter.DIRECTION_INBOUND
+    
+    # sniffed frame, with its FCS and channel
+    assert packets[1]['frame']==[0x41,0xcc,0x07,0xaa,0xbb]
+    assert packets[1]['hasFcs']==True
+    assert packets[1]['channel']==20
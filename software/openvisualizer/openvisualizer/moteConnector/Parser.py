@@ -42,6 +42,7 @@ class Parser(object):
         
         # local variables
         self.parsingKeys          = []
+        self.parsingTable         = {}  # val -> parser, for keys at index 0
         self.headerParsingKeys    = []
         self.named_tuple          = {}
     
@@ -59,9 +60,12 @@ class Parser(object):
         # parse the header
         # TODO
      
-        # call the next header parser
+        # call the next header parser, looking up the frame type first
+        parser = self.parsingTable.get(input[0])
+        if parser:
+            return parser(input[self.headerLength:])
         for key in self.parsingKeys:
-            if input[key.index]==key.val:
+            if key.index!=0 and input[key.index]==key.val:
                 return key.parser(input[self.headerLength:])
         
         # if you get here, no key was found
@@ -77,4 +81,6 @@ class Parser(object):
             raise ParserException(ParserException.TOO_SHORT)
     
     def _addSubParser(self,index=None,val=None,parser=None):
-        self.parsingKeys.append(ParsingKey(index,val,parser))
\ No newline at end of file
+        self.parsingKeys.append(ParsingKey(index,val,parser))
+        if index==0 and val not in self.parsingTable:
+            self.parsingTable[val] = parser
\ No newline at end of file
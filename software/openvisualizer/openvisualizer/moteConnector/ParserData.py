@@ -23,7 +23,20 @@ class ParserData(Parser.Parser):
     IPHC_SAM       = 4
     IPHC_DAM       = 0
     
-     
+    # offsets in the frame (after the 'D' byte)
+    ASN_OFFSET     = 2
+    DEST_OFFSET    = 7
+    SOURCE_OFFSET  = 15
+    PAYLOAD_OFFSET = 23
+    
+    # precompiled structures
+    ASN            = struct.Struct('<BHH')   # asn_4, asn_2_3, asn_0_1
+    LATENCY_ASN    = struct.Struct('<HHB')   # bytes0and1, bytes2and3, byte4
+    
+    # udp port 61001 (0xee,0x49) of the UDPLatency app, position in payload
+    UDPLATENCY_PORT_OFFSET = 36
+    UDPLATENCY_PORT        = (0xee,0x49)
+    
     def __init__(self):
         
         # log
@@ -47,97 +60,79 @@ class ParserData(Parser.Parser):
         
         # ensure input not short longer than header
         self._checkLength(input)
-   
-        headerBytes = input[:2]
-        #asn comes in the next 5bytes.  
         
-        asnbytes=input[2:7]
-        (self._asn) = struct.unpack('<BHH',''.join([chr(c) for c in asnbytes]))
+        # single copy of the frame into a buffer, all fixed-size header fields
+        # are unpacked from there in place
+        buf = bytearray(input)
         
-        #source and destination of the message
-        dest = input[7:15]
+        #asn comes in the next 5bytes.  
+        (self._asn) = self.ASN.unpack_from(buf,self.ASN_OFFSET)
         
         #source is elided!!! so it is not there.. check that.
-        source = input[15:23]
+        source = input[self.SOURCE_OFFSET:self.PAYLOAD_OFFSET]
         
         if log.isEnabledFor(logging.DEBUG):
-            a="".join(hex(c) for c in dest)
+            a="".join(hex(c) for c in input[self.DEST_OFFSET:self.SOURCE_OFFSET])
             log.debug("destination address of the packet is {0} ".format(a))
-        
-        if log.isEnabledFor(logging.DEBUG):
             a="".join(hex(c) for c in source)
             log.debug("source address (just previous hop) of the packet is {0} ".format(a))
         
         # remove asn src and dest and mote id at the beginning.
         # this is a hack for latency measurements... TODO, move latency to an app listening on the corresponding port.
         # inject end_asn into the packet as well
-        input = input[23:]
+        input = input[self.PAYLOAD_OFFSET:]
         
         if log.isEnabledFor(logging.DEBUG):
             log.debug("packet without source,dest and asn {0}".format(input))
         
         # when the packet goes to internet it comes with the asn at the beginning as timestamp.
-         
+        
         # cross layer trick here. capture UDP packet from udpLatency and get ASN to compute latency.
         # then notify a latency component that will plot that information.
-        # port 61001==0xee,0x49
-        if len(input) >37:
-           if input[36]==238 and input[37]==73:
-            # udp port 61001 for udplatency app.
-               aux      = input[len(input)-5:]               # last 5 bytes of the packet are the ASN in the UDP latency packet
-               diff     = self._asndiference(aux,asnbytes)   # calculate difference 
-               timeinus = diff*self.MSPERSLOT                # compute time in ms
-               SN       = input[len(input)-23:len(input)-21] # SN sent by mote
-               parent   = input[len(input)-21:len(input)-13] # the parent node is the first element (used to know topology)
-               node     = input[len(input)-13:len(input)-5]  # the node address
-               
-               if timeinus<0xFFFF:
-               # notify latency manager component. only if a valid value
-                  dispatcher.send(
-                     sender        = 'parserData',
-                     signal        = 'latency',
-                     data          = (node,timeinus,parent,SN),
-                  )
-               else:
-                   # this usually happens when the serial port framing is not correct and more than one message is parsed at the same time. this will be solved with HDLC framing.
-                   print "Wrong latency computation {0} = {1} mS".format(str(node),timeinus)
-                   print ",".join(hex(c) for c in input)
-                   log.warning("Wrong latency computation {0} = {1} mS".format(str(node),timeinus))
-                   pass
-               # in case we want to send the computed time to internet..
-               # computed=struct.pack('<H', timeinus)#to be appended to the pkt
-               # for x in computed:
-                   #input.append(x)
-           else:
-               # no udplatency
-               # print input
-               pass     
-        else:
-           pass      
-       
+        portOffset = self.UDPLATENCY_PORT_OFFSET
+        if (
+                len(input)>portOffset+1 and
+                (input[portOffset],input[portOffset+1])==self.UDPLATENCY_PORT
+            ):
+            # last 5 bytes of the packet are the ASN in the UDP latency packet
+            asnInit  = self.LATENCY_ASN.unpack_from(buf,len(buf)-self.LATENCY_ASN.size)
+            asnEnd   = self.LATENCY_ASN.unpack_from(buf,self.ASN_OFFSET)
+            diff     = self._asndiference(asnInit,asnEnd) # calculate difference 
+            timeinus = diff*self.MSPERSLOT                # compute time in ms
+            SN       = input[-23:-21]                     # SN sent by mote
+            parent   = input[-21:-13]                     # the parent node is the first element (used to know topology)
+            node     = input[-13:-5]                      # the node address
+            
+            if timeinus<0xFFFF:
+                # notify latency manager component. only if a valid value
+                dispatcher.send(
+                    sender        = 'parserData',
+                    signal        = 'latency',
+                    data          = (node,timeinus,parent,SN),
+                )
+            else:
+                # this usually happens when the serial port framing is not correct and more than one message is parsed at the same time. this will be solved with HDLC framing.
+                print "Wrong latency computation {0} = {1} mS".format(str(node),timeinus)
+                print ",".join(hex(c) for c in input)
+                log.warning("Wrong latency computation {0} = {1} mS".format(str(node),timeinus))
+        
         eventType='data'
         # notify a tuple including source as one hop away nodes elide SRC address as can be inferred from MAC layer header
         return eventType, (source, input)
 
  #======================== private =========================================
  
-    def _asndiference(self,init,end):
-      
-       asninit = struct.unpack('<HHB',''.join([chr(c) for c in init]))
-       asnend  = struct.unpack('<HHB',''.join([chr(c) for c in end]))
-       if asnend[2] != asninit[2]: #'byte4'
-          return 0xFFFFFFFF
-       else:
-           pass
-       
-       diff = 0
-       if asnend[1] == asninit[1]:#'bytes2and3'
-          return asnend[0]-asninit[0]#'bytes0and1'
-       else:
-          if asnend[1]-asninit[1]==1:##'bytes2and3'              diff  = asnend[0]#'bytes0and1'
-              diff += 0xffff-asninit[0]#'bytes0and1'
-              diff += 1
-          else:   
-              diff = 0xFFFFFFFF
-       
-       return diff
\ No newline at end of file
+    def _asndiference(self,asninit,asnend):
+        '''
+        Number of slots between two ASNs, each given as a
+        (bytes0and1, bytes2and3, byte4) tuple.
+        '''
+        if asnend[2] != asninit[2]: #'byte4'
+            return 0xFFFFFFFF
+        
+        if asnend[1] == asninit[1]:#'bytes2and3'
+            return asnend[0]-asninit[0]#'bytes0and1'
+        elif asnend[1]-asninit[1]==1:#'bytes2and3'
+            return asnend[0]+0xffff-asninit[0]+1#'bytes0and1'
+        else:
+            return 0xFFFFFFFF
@@ -12,8 +12,7 @@ import struct
 
 from ParserException import ParserException
 import Parser
-
-import StackDefines
+import ReportAggregator
 
 class ParserInfoErrorCritical(Parser.Parser):
     
@@ -26,6 +25,8 @@ class ParserInfoErrorCritical(Parser.Parser):
                            SEVERITY_ERROR,
                            SEVERITY_CRITICAL,]
     
+    REPORT              = struct.Struct('>HBBHH')
+    
     def __init__(self,severity):
         assert severity in self.SEVERITY_ALL
         
@@ -35,6 +36,9 @@ class ParserInfoErrorCritical(Parser.Parser):
         # store params
         self.severity   = severity
         
+        # local variables
+        self.reportAggregator = ReportAggregator.ReportAggregator()
+        
         # initialize parent class
         Parser.Parser.__init__(self,self.HEADER_LENGTH)
     
@@ -52,16 +56,30 @@ class ParserInfoErrorCritical(Parser.Parser):
             callingComponent,
             error_code,
             arg1,
-            arg2) = struct.unpack('>HBBHH',''.join([chr(c) for c in input]))
-        except struct.error:
+            arg2) = self.REPORT.unpack(str(bytearray(input)))
+        except (struct.error,ValueError):
             raise ParserException(ParserException.DESERIALIZE,"could not extract data from {0}".format(input))
         
+        # aggregate, only log the first occurrence and then periodically
+        numSinceLogged = self.reportAggregator.indicateReport(
+            self.severity,
+            moteId,
+            callingComponent,
+            error_code,
+            arg1,
+            arg2,
+        )
+        if numSinceLogged is None:
+            return 'error', input
+        
         # turn into string
         output = "{MOTEID:x} [{COMPONENT}] {ERROR_DESC}".format(
-            COMPONENT  = self._translateCallingComponent(callingComponent),
+            COMPONENT  = ReportAggregator.translateCallingComponent(callingComponent),
             MOTEID     = moteId,
-            ERROR_DESC = self._translateErrorDescription(error_code,arg1,arg2),
+            ERROR_DESC = ReportAggregator.translateErrorDescription(error_code,arg1,arg2),
         )
+        if numSinceLogged>1:
+            output += " ({0} occurrences since last logged)".format(numSinceLogged)
         
         # log
         if   self.severity==self.SEVERITY_INFO:
@@ -74,20 +92,3 @@ class ParserInfoErrorCritical(Parser.Parser):
             raise SystemError("unexpected severity={0}".format(self.severity))
         
         return 'error', input
-    
-    #======================== private =========================================
-    
-    def _translateCallingComponent(self,callingComponent):
-        try:
-            return StackDefines.components[callingComponent]
-        except KeyError:
-            return "unknown component code {0}".format(callingComponent)
-    
-    def _translateErrorDescription(self,error_code,arg1,arg2):
-        try:
-            if error_code == 60:
-                arg1 = StackDefines.sixtop_returncode[arg1]
-                arg2 = StackDefines.sixtop_statemachine[arg2]
-            return StackDefines.errorDescriptions[error_code].format(arg1,arg2)
-        except KeyError:
-            return "unknown error {0} arg1={1} arg2={2}".format(error_code,arg1,arg2)
\ No newline at end of file
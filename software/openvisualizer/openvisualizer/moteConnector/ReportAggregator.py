@@ -0,0 +1,167 @@
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+import logging
+log = logging.getLogger('ReportAggregator')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import threading
+import time
+
+from openvisualizer.eventBus import eventBusClient
+
+import StackDefines
+
+#============================ functions =======================================
+
+def translateCallingComponent(callingComponent):
+    try:
+        return StackDefines.components[callingComponent]
+    except KeyError:
+        return "unknown component code {0}".format(callingComponent)
+
+def translateErrorDescription(error_code,arg1,arg2):
+    try:
+        if error_code == 60:
+            arg1 = StackDefines.sixtop_returncode[arg1]
+            arg2 = StackDefines.sixtop_statemachine[arg2]
+        return StackDefines.errorDescriptions[error_code].format(arg1,arg2)
+    except KeyError:
+        return "unknown error {0} arg1={1} arg2={2}".format(error_code,arg1,arg2)
+
+#============================ class ===========================================
+
+class ReportAggregator(eventBusClient.eventBusClient):
+    '''
+    Aggregates the info/error/critical reports of all the motes.
+    
+    Reports are keyed by (mote, component, error code). For each key, the
+    number of occurrences, the time it was first and last seen, and the
+    arguments of the latest occurrence are kept. The parsers only log a report
+    the first time it is seen, then at most once every ``logInterval``
+    seconds, so a mote repeating the same error does not flood the logs.
+    
+    The aggregated table is returned on the ``getReports`` signal of the event
+    bus.
+    
+    There is a single instance of this class (singleton pattern).
+    '''
+    
+    LOG_INTERVAL = 10.0 # s
+    
+    #======================== singleton pattern ===============================
+    
+    _instance = None
+    _init     = False
+    
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super(ReportAggregator, cls).__new__(cls)
+        return cls._instance
+    
+    #======================== main ============================================
+    
+    def __init__(self,logInterval=LOG_INTERVAL):
+        
+        # don't re-initialize an instance (singleton pattern)
+        if self._init:
+            return
+        self._init = True
+        
+        # log
+        log.info("create instance")
+        
+        # store params
+        self.logInterval          = logInterval
+        
+        # local variables
+        self.reportsLock          = threading.Lock()
+        self.reports              = {}
+        
+        # initialize parent class
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name                  = 'ReportAggregator',
+            registrations         = [
+                {
+                    'sender'      : self.WILDCARD,
+                    'signal'      : 'getReports',
+                    'callback'    : self._getReports_notif,
+                },
+            ]
+        )
+    
+    #======================== public ==========================================
+    
+    def indicateReport(self,severity,moteId,callingComponent,error_code,arg1,arg2):
+        '''
+        Account for a report received from a mote.
+        
+        :returns: The number of occurrences of that report since it was last
+                  logged, if it is due for logging now, None otherwise.
+        '''
+        now = time.time()
+        key = (moteId,callingComponent,error_code)
+        
+        with self.reportsLock:
+            report = self.reports.get(key)
+            if report is None:
+                report = {
+                    'moteId':             moteId,
+                    'component':          callingComponent,
+                    'errorCode':          error_code,
+                    'count':              0,
+                    'firstSeen':          now,
+                    'lastLogged':         None,
+                    'numSinceLogged':     0,
+                }
+                self.reports[key] = report
+            
+            report['severity']         = severity
+            report['arg1']             = arg1
+            report['arg2']             = arg2
+            report['lastSeen']         = now
+            report['count']           += 1
+            report['numSinceLogged']  += 1
+            
+            if report['lastLogged'] is None or now-report['lastLogged']>=self.logInterval:
+                numSinceLogged            = report['numSinceLogged']
+                report['lastLogged']      = now
+                report['numSinceLogged']  = 0
+                return numSinceLogged
+        
+        return None
+    
+    def setLogInterval(self,logInterval):
+        with self.reportsLock:
+            self.logInterval = logInterval
+    
+    def getReports(self):
+        '''
+        :returns: A list with the aggregated reports, most recent first. The
+                  component and error description are translated to text.
+        '''
+        with self.reportsLock:
+            reports = [dict(r) for r in self.reports.values()]
+        
+        reports.sort(key=lambda r: r['lastSeen'],reverse=True)
+        for r in reports:
+            r['severity']       = chr(r['severity'])
+            r['moteId']         = '{0:x}'.format(r['moteId'])
+            r['description']    = translateErrorDescription(r['errorCode'],r['arg1'],r['arg2'])
+            r['component']      = translateCallingComponent(r['component'])
+            del r['lastLogged']
+            del r['numSinceLogged']
+        return reports
+    
+    def clear(self):
+        with self.reportsLock:
+            self.reports = {}
+    
+    #======================== private =========================================
+    
+    def _getReports_notif(self,sender,signal,data):
+        return self.getReports()
@@ -13,34 +13,65 @@ import socket
 import random
 import traceback
 import sys
+import time
 import openvisualizer.openvisualizer_utils as u
 
 from openvisualizer.eventBus      import eventBusClient
 from openvisualizer.moteConnector import OpenParser
 
 class SerialTester(eventBusClient.eventBusClient):
+    '''
+    Benchmarks the serial link to a mote, using its serial echo.
+    
+    Test packets are sent to the mote, which echoes them back. For each
+    packet length of the sweep, ``numTestPkt`` packets are sent with up to
+    ``window`` of them in flight. When more than one packet may be in flight,
+    the first two bytes of each test packet carry a sequence number, used to
+    match the echoes.
+    
+    For each packet length, the report holds the number of packets sent,
+    echoed correctly, corrupted and lost, the echoed throughput, the
+    percentiles of the round-trip time and, if the moteProbe is known, the
+    number of frames received with an invalid HDLC framing or CRC.
+    '''
     
     DFLT_TESTPKT_LENGTH = 10  ##< number of bytes in a test packet
     DFLT_NUM_TESTPKT    = 20  ##< number of test packets to send
     DFLT_TIMEOUT        = 5   ##< timeout in second for getting a reply
+    DFLT_WINDOW         = 1   ##< number of test packets in flight
+    
+    SEQNUM_LENGTH       = 2   ##< number of bytes of the sequence number
+    ECHO_HEADER_LENGTH  = 1+2+5 # type (1B), moteId (2B), ASN (5B)
+    PERCENTILES         = [50,90,99]
     
-    def __init__(self,moteProbeSerialPort):
+    def __init__(self,moteProbeSerialPort,probe=None):
+        '''
+        :param moteProbeSerialPort: Name of the port of the mote to test.
+        :param probe:               The moteProbe of that port, to report its
+                                    HDLC errors. Optional.
+        '''
         
         # log
         log.info("creating instance")
         
         # store params
         self.moteProbeSerialPort  = moteProbeSerialPort
+        self.probe                = probe
         
         # local variables
         self.dataLock             = threading.RLock()
-        self.testPktLen           = self.DFLT_TESTPKT_LENGTH
+        self.testPktLengths       = [self.DFLT_TESTPKT_LENGTH]
         self.numTestPkt           = self.DFLT_NUM_TESTPKT
         self.timeout              = self.DFLT_TIMEOUT
+        self.window               = self.DFLT_WINDOW
         self.traceCb              = None
         self.busyTesting          = False
         self.lastSent             = []
         self.lastReceived         = []
+        self.outstanding          = {}  # seqNum -> (packet, time sent)
+        self.stepWindow           = self.DFLT_WINDOW
+        self.rtts                 = []
+        self.report               = None
         self.waitForReply         = threading.Event()
         self._resetStats()
         
@@ -69,21 +100,50 @@ class SerialTester(eventBusClient.eventBusClient):
         
         # handle data
         if chr(data[0])==chr(OpenParser.OpenParser.SERFRAME_MOTE2PC_DATA):
-            # don't handle if I'm not testing
+            now = time.time()
             with self.dataLock:
+                # don't handle if I'm not testing
                 if not self.busyTesting:
                     return
-            with self.dataLock:
-               self.lastReceived = data[1+2+5:] # type (1B), moteId (2B), ASN (5B)
-               # wake up other thread
-               self.waitForReply.set()
+                
+                self.lastReceived = data[self.ECHO_HEADER_LENGTH:]
+                if self.stepWindow==1:
+                    # the echo can only be that of the packet in flight
+                    seqNum        = self.outstanding.keys()[0] if self.outstanding else None
+                else:
+                    seqNum        = self._getSeqNum(self.lastReceived)
+                
+                if seqNum not in self.outstanding:
+                    # late echo of a packet which timed out, or corrupted sequence number
+                    self.stepStats['numUnexpected']   += 1
+                    self._log('!! unexpected.')
+                else:
+                    (packetSent,timeSent) = self.outstanding.pop(seqNum)
+                    if self.lastReceived==packetSent:
+                        self.stepStats['numOk']       += 1
+                        self.rtts                     += [now-timeSent]
+                    else:
+                        self.stepStats['numCorrupted']+= 1
+                        self._log('!! corrupted.')
+                
+                # wake up other thread
+                self.waitForReply.set()
     
     #===== setup test
     
     def setTestPktLength(self,newLength):
         assert type(newLength)==int
+        self.setTestPktLengths([newLength])
+    
+    def setTestPktLengths(self,newLengths):
+        '''
+        :param newLengths: List of packet lengths to sweep, in bytes.
+        '''
+        assert newLengths
+        for l in newLengths:
+            assert type(l)==int and l>0
         with self.dataLock:
-            self.testPktLen  = newLength
+            self.testPktLengths  = list(newLengths)
     
     def setNumTestPkt(self,newNum):
         assert type(newNum)==int
@@ -91,10 +151,15 @@ class SerialTester(eventBusClient.eventBusClient):
             self.numTestPkt  = newNum
     
     def setTimeout(self,newTimeout):
-        assert type(newTimeout)==int
+        assert type(newTimeout) in [int,float]
         with self.dataLock:
             self.timeout     = newTimeout
     
+    def setWindow(self,newWindow):
+        assert type(newWindow)==int and newWindow>0
+        with self.dataLock:
+            self.window      = newWindow
+    
     def setTrace(self,newTraceCb):
         assert (callable(newTraceCb)) or (newTraceCb is None)
         with self.dataLock:
@@ -106,16 +171,34 @@ class SerialTester(eventBusClient.eventBusClient):
         if blocking:
             self._runtest()
         else:
+            with self.dataLock:
+                self.busyTesting = True
             threading.Thread(target=self._runtest).start()
     
+    def isTesting(self):
+        with self.dataLock:
+            return self.busyTesting
+    
     #===== get test results
     
     def getStats(self):
+        '''
+        :returns: The counters of the last test, over all packet lengths.
+        '''
         returnVal = None
         with self.dataLock:
             returnVal = self.stats.copy()
         return returnVal
     
+    def getReport(self):
+        '''
+        :returns: The results of the last test, one entry per packet length,
+                  as a dictionary which can be serialized to JSON; None if no
+                  test has completed.
+        '''
+        with self.dataLock:
+            return self.report
+    
     #======================== private =========================================
     
     def _runtest(self):
@@ -126,60 +209,141 @@ class SerialTester(eventBusClient.eventBusClient):
             
         # gather test parameters
         with self.dataLock:
-            testPktLen = self.testPktLen
-            numTestPkt = self.numTestPkt
-            timeout    = self.timeout
+            testPktLengths = self.testPktLengths[:]
+            numTestPkt     = self.numTestPkt
+            timeout        = self.timeout
+            window         = self.window
         
         # reset stats
         self._resetStats()
         
-        # send packets and collect stats
-        for i in range(numTestPkt):
-            
-            # prepare random packet to send
-            packetToSend = [random.randint(0x00,0xff) for _ in range(testPktLen)]
+        # send packets and collect stats, for each packet length
+        results = []
+        for testPktLen in testPktLengths:
+            results += [self._runtestStep(testPktLen,numTestPkt,timeout,window)]
+        
+        # I'm not testing
+        with self.dataLock:
+            self.report      = {
+                'port':           self.moteProbeSerialPort,
+                'numTestPkt':     numTestPkt,
+                'timeout':        timeout,
+                'window':         window,
+                'results':        results,
+            }
+            self.busyTesting = False
+    
+    def _runtestStep(self,testPktLen,numTestPkt,timeout,window):
+        
+        if testPktLen<self.SEQNUM_LENGTH:
+            # no room for a sequence number, one packet at a time
+            window = 1
+        
+        with self.dataLock:
+            self.stepWindow       = window
+            self.outstanding      = {}
+            self.rtts             = []
+            self.stepStats        = {
+                'numSent'         : 0,
+                'numOk'           : 0,
+                'numCorrupted'    : 0,
+                'numTimeout'      : 0,
+                'numUnexpected'   : 0,
+            }
+        numHdlcErrors             = self._getNumHdlcErrors()
+        startTime                 = time.time()
+        seqNum                    = 0
+        
+        while True:
             
-            # remember as last sent packet
             with self.dataLock:
-                self.lastSent = packetToSend[:]
+                
+                # expire the packets waiting for too long
+                now = time.time()
+                for (s,(_,timeSent)) in self.outstanding.items():
+                    if now-timeSent>=timeout:
+                        del self.outstanding[s]
+                        self.stepStats['numTimeout']  += 1
+                        self._log('!! timeout.')
+                
+                numSent   = self.stepStats['numSent']
+                if numSent>=numTestPkt and not self.outstanding:
+                    break
+                canSend   = numSent<numTestPkt and len(self.outstanding)<window
+                
+                if canSend:
+                    # prepare random packet to send, starting with its sequence number
+                    packetToSend = [random.randint(0x00,0xff) for _ in range(testPktLen)]
+                    if window>1:
+                        packetToSend[:self.SEQNUM_LENGTH] = [seqNum>>8,seqNum&0xff]
+                        seqNum = (seqNum+1)&0xffff
+                    self.lastSent                     = packetToSend
+                    self.outstanding[self._getSeqNum(packetToSend)] = (packetToSend,time.time())
+                    self.stepStats['numSent']        += 1
+                    nextTimeout  = None
+                else:
+                    nextTimeout  = min(t for (_,t) in self.outstanding.values())+timeout-now
             
-            # send
-            self.dispatch(
-                signal        = 'fromMoteConnector@'+self.moteProbeSerialPort,
-                data          = ''.join(
-                    [chr(OpenParser.OpenParser.SERFRAME_PC2MOTE_TRIGGERSERIALECHO)]+[chr(b) for b in packetToSend]
+            if canSend:
+                # send
+                self.dispatch(
+                    signal        = 'fromMoteConnector@'+self.moteProbeSerialPort,
+                    data          = ''.join(
+                        [chr(OpenParser.OpenParser.SERFRAME_PC2MOTE_TRIGGERSERIALECHO)]+[chr(b) for b in packetToSend]
+                    )
                 )
-            )
-            
-            with self.dataLock:
-                self.stats['numSent']                 += 1
-            
-            # log
-            self._log('sent:     {0}'.format(self.formatList(self.lastSent)))
-            
-            # wait for answer
-            self.waitForReply.clear()
-            if self.waitForReply.wait(timeout):
                 
                 # log
-                self._log('received: {0}'.format(self.formatList(self.lastReceived)))
-                
-                # echo received
-                with self.dataLock:
-                    if self.lastReceived==self.lastSent:
-                        self.stats['numOk']           += 1
-                    else:
-                        self.stats['numCorrupted']    += 1
-                        self._log('!! corrupted.')
+                self._log('sent:     {0}'.format(self.formatList(packetToSend)))
             else:
-                # timeout
-                with self.dataLock:
-                    self.stats['numTimeout']          += 1
-                    self._log('!! timeout.')
+                # wait for an answer, or for the oldest packet to time out
+                self.waitForReply.wait(max(nextTimeout,0))
+                self.waitForReply.clear()
+        
+        duration = time.time()-startTime
         
-        # I'm not testing
         with self.dataLock:
-            self.busyTesting = False
+            result = self.stepStats.copy()
+            rtts   = sorted(self.rtts)
+            for k in ['numSent','numOk','numCorrupted','numTimeout']:
+                self.stats[k] += result[k]
+        
+        result['pktLength']       = testPktLen
+        result['duration']        = duration
+        result['lossRate']        = float(result['numTimeout'])/result['numSent'] if result['numSent'] else 0.0
+        result['pktPerSec']       = result['numOk']/duration if duration else 0.0
+        result['bytesPerSec']     = result['numOk']*testPktLen/duration if duration else 0.0
+        result['rttMs']           = self._summarize(rtts)
+        if numHdlcErrors is not None:
+            result['numHdlcErrors'] = self._getNumHdlcErrors()-numHdlcErrors
+        
+        return result
+    
+    def _getSeqNum(self,packet):
+        if len(packet)<self.SEQNUM_LENGTH:
+            return None
+        return (packet[0]<<8)|packet[1]
+    
+    def _getNumHdlcErrors(self):
+        if self.probe is None:
+            return None
+        return self.probe.getRxStats()['numRxHdlcErrors']
+    
+    def _summarize(self,rtts):
+        '''
+        :returns: The min, max and percentiles of the round-trip times, in ms.
+        '''
+        if not rtts:
+            return None
+        returnVal = {
+            'min':  rtts[0]*1000,
+            'max':  rtts[-1]*1000,
+        }
+        for p in self.PERCENTILES:
+            # nearest-rank percentile
+            rank  = max(int(-(-p*len(rtts)//100)),1)
+            returnVal['p{0}'.format(p)] = rtts[rank-1]*1000
+        return returnVal
     
     def _log(self,msg):
         if log.isEnabledFor(logging.DEBUG):
@@ -0,0 +1,61 @@
+'''
+Benchmark of the OpenParser on data frames, the hot path towards the LBR.
+
+Feeds the same data frames repeatedly through OpenParser.parseInput() and
+prints the number of frames parsed per second, for a plain data frame and
+for a UDPLatency frame (which also computes and dispatches the latency), and
+for an error report a mote keeps repeating.
+
+Run this benchmark by double-clicking on this file, or with
+'python bench_OpenParser.py [numFrames]'.
+'''
+
+import sys
+import os
+if __name__=='__main__':
+    here = sys.path[0]
+    sys.path.insert(0, os.path.join(here, '..', '..', '..'))                     # root/
+    sys.path.insert(0, os.path.join(here, '..'))                                 # moteConnector/
+
+import time
+
+import OpenParser
+
+#============================ defines =========================================
+
+NUM_FRAMES_DEFAULT = 100000
+
+ASN                = [0x10,0x00,0x00,0x00,0x00]
+DEST               = [0xaa]*8
+SOURCE             = [0xbb]*8
+
+FRAMES             = {
+    # 'D', mote ID, ASN, dest, source, 6LoWPAN payload
+    'data (80B)':       [ord('D'),0x00,0x01]+ASN+DEST+SOURCE+[0x00]*80,
+    'udpLatency (80B)': [ord('D'),0x00,0x01]+ASN+DEST+SOURCE+[0x00]*36+[0xee,0x49]+[0x00]*37+ASN,
+    # 'E', mote ID, component, error code, arg1, arg2
+    'error (repeated)': [ord('E'),0x00,0x01,0x02,0x04,0x00,0x01,0x00,0x02],
+}
+
+#============================ main ============================================
+
+def benchmark(parser,frame,numFrames):
+    startTime = time.time()
+    for _ in xrange(numFrames):
+        parser.parseInput(frame)
+    return numFrames/(time.time()-startTime)
+
+def main():
+    
+    if len(sys.argv)>1:
+        numFrames = int(sys.argv[1])
+    else:
+        numFrames = NUM_FRAMES_DEFAULT
+    
+    parser = OpenParser.OpenParser()
+    
+    for (name,frame) in sorted(FRAMES.items()):
+        print '{0:<20}: {1:>10.0f} frames/s'.format(name,benchmark(parser,frame,numFrames))
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # moteConnector/
+
+import logging
+import logging.handlers
+import json
+
+import pytest
+
+from pydispatch import dispatcher
+
+import OpenParser
+import ParserException
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_openParser.log'
+
+import logging
+log = logging.getLogger('test_openParser')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_openParser',
+                   'OpenParser',
+                   'ParserData',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+MOTE_DEST   = [0xaa]*8
+MOTE_SRC    = [0xbb]*8
+MOTE_PARENT = [0xcc]*8
+MOTE_NODE   = [0xdd]*8
+SN          = [0x01,0x02]
+
+#============================ fixtures ========================================
+
+EXPECTEDLATENCY = [
+    #           asnSent            asnReceived        latency (ms)
+    json.dumps(([100,0,0,0,0],     [110,0,0,0,0],     10*15)),
+    json.dumps(([0xf0,0xff,0,0,0], [0x10,0x00,1,0,0], 0x20*15)),
+]
+
+@pytest.fixture(params=EXPECTEDLATENCY)
+def expectedLatency(request):
+    return request.param
+
+#============================ helpers =========================================
+
+def dataFrame(asn,payload):
+    return [OpenParser.OpenParser.SERFRAME_MOTE2PC_DATA,0x00,0x01]+asn+MOTE_DEST+MOTE_SRC+payload
+
+def latencyPayload(asnSent):
+    return [0x00]*36+[0xee,0x49]+[0x00]*4+SN+MOTE_PARENT+MOTE_NODE+asnSent
+
+#============================ tests ===========================================
+
+def test_dataFrame():
+    
+    parser  = OpenParser.OpenParser()
+    payload = [0x60,0x00,0x01,0x02,0x03]
+    
+    (eventType,(source,parsedPayload)) = parser.parseInput(dataFrame([0x00]*5,payload))
+    
+    assert eventType=='data'
+    assert source==MOTE_SRC
+    assert parsedPayload==payload
+
+def test_unknownFrameType():
+    
+    parser  = OpenParser.OpenParser()
+    
+    with pytest.raises(ParserException.ParserException):
+        parser.parseInput([ord('Z'),0x00,0x01])
+
+def test_latency(expectedLatency):
+    
+    (asnSent,asnReceived,latency) = json.loads(expectedLatency)
+    
+    received = []
+    def _latency_cb(signal,sender,data):
+        received.append(data)
+    dispatcher.connect(_latency_cb,signal='latency')
+    
+    parser  = OpenParser.OpenParser()
+    parser.parseInput(dataFrame(asnReceived,latencyPayload(asnSent)))
+    
+    dispatcher.disconnect(_latency_cb,signal='latency')
+    
+    assert received==[(MOTE_NODE,latency,MOTE_PARENT,SN)]
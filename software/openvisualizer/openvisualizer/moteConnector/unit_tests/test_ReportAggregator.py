@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # moteConnector/
+
+import logging
+import logging.handlers
+
+import pytest
+
+from pydispatch import dispatcher
+
+import OpenParser
+import ReportAggregator
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_reportAggregator.log'
+
+import logging
+log = logging.getLogger('test_reportAggregator')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_reportAggregator',
+                   'ReportAggregator',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ helpers =========================================
+
+class RecordingHandler(logging.Handler):
+    
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+    
+    def emit(self,record):
+        self.records += [record]
+
+def reportFrame(severity,moteId,component,errorCode,arg1=0,arg2=0):
+    return [ord(severity),moteId>>8,moteId&0xff,component,errorCode,arg1>>8,arg1&0xff,arg2>>8,arg2&0xff]
+
+@pytest.fixture
+def aggregator(request):
+    aggregator = ReportAggregator.ReportAggregator()
+    aggregator.clear()
+    aggregator.setLogInterval(ReportAggregator.ReportAggregator.LOG_INTERVAL)
+    return aggregator
+
+@pytest.fixture
+def logged(request):
+    handler = RecordingHandler()
+    logger  = logging.getLogger('ParserInfoErrorCritical')
+    logger.addHandler(handler)
+    request.addfinalizer(lambda: logger.removeHandler(handler))
+    return handler.records
+
+#============================ tests ===========================================
+
+def test_logOnlyFirstOccurrence(aggregator,logged):
+    
+    parser = OpenParser.OpenParser()
+    for arg1 in range(100):
+        parser.parseInput(reportFrame('E',0x00ab,2,4,arg1))
+    parser.parseInput(reportFrame('E',0x00ab,2,5))
+    
+    assert len(logged)==2
+    assert logged[0].levelno==logging.ERROR
+    assert logged[0].getMessage()=='ab [IDMANAGER] the input buffer has overflown'
+    
+    reports = aggregator.getReports()
+    assert [(r['errorCode'],r['count']) for r in reports]==[(5,1),(4,100)]
+    assert reports[1]['arg1']==99
+    assert reports[1]['severity']=='E'
+    assert reports[1]['moteId']=='ab'
+    assert reports[1]['firstSeen']<=reports[1]['lastSeen']
+
+def test_logPeriodically(aggregator,logged):
+    
+    aggregator.setLogInterval(0)
+    
+    parser = OpenParser.OpenParser()
+    parser.parseInput(reportFrame('C',0x0001,2,4))
+    parser.parseInput(reportFrame('C',0x0001,2,4))
+    
+    assert len(logged)==2
+    assert logged[1].levelno==logging.CRITICAL
+    
+    aggregator.setLogInterval(3600)
+    for _ in range(5):
+        parser.parseInput(reportFrame('C',0x0001,2,4))
+    aggregator.setLogInterval(0)
+    parser.parseInput(reportFrame('C',0x0001,2,4))
+    
+    assert len(logged)==3
+    assert logged[2].getMessage().endswith('(6 occurrences since last logged)')
+
+def test_keyedPerMote(aggregator,logged):
+    
+    parser = OpenParser.OpenParser()
+    parser.parseInput(reportFrame('E',0x0001,2,4))
+    parser.parseInput(reportFrame('E',0x0002,2,4))
+    
+    assert len(logged)==2
+    assert sorted(r['moteId'] for r in aggregator.getReports())==['1','2']
+
+def test_getReportsSignal(aggregator):
+    
+    OpenParser.OpenParser().parseInput(reportFrame('E',0x0001,2,4))
+    
+    responses = dispatcher.send(sender='test',signal='getReports',data=[])
+    reports   = [r for (_,r) in responses if r is not None]
+    assert len(reports)==1
+    assert [r['count'] for r in reports[0]]==[1]
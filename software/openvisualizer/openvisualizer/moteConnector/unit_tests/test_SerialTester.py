@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))                       # root/
+sys.path.insert(0, os.path.join(here, '..'))                                   # moteConnector/
+
+import logging
+import logging.handlers
+import json
+import threading
+
+import pytest
+
+from pydispatch import dispatcher
+
+import SerialTester
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_serialTester.log'
+
+import logging
+log = logging.getLogger('test_serialTester')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_serialTester',
+                   'SerialTester',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ helpers =========================================
+
+_nextPort = [0]
+
+class FakeEchoMote(object):
+    '''
+    Echoes the test packets back after a short delay, like the serial echo of
+    a mote. Every packet whose index is in drop is not echoed, and every
+    packet whose index is in corrupt is echoed with its last byte changed.
+    '''
+    
+    DELAY = 0.005
+    
+    def __init__(self,drop=[],corrupt=[]):
+        _nextPort[0] += 1
+        self.portname   = 'fake{0}'.format(_nextPort[0])
+        self.drop       = drop
+        self.corrupt    = corrupt
+        self.numRx      = 0
+        self.maxPending = 0
+        self.pending    = 0
+        self.lock       = threading.Lock()
+        dispatcher.connect(self._fromMoteConnector,signal='fromMoteConnector@'+self.portname)
+    
+    def close(self):
+        dispatcher.disconnect(self._fromMoteConnector,signal='fromMoteConnector@'+self.portname)
+    
+    def _fromMoteConnector(self,data):
+        assert data[0]=='S'
+        payload = [ord(c) for c in data[1:]]
+        with self.lock:
+            index           = self.numRx
+            self.numRx     += 1
+            if index in self.drop:
+                return
+            if index in self.corrupt:
+                payload[-1] ^= 0xff
+            self.pending   += 1
+            self.maxPending = max(self.maxPending,self.pending)
+        threading.Timer(self.DELAY,self._echo,args=(payload,)).start()
+    
+    def _echo(self,payload):
+        with self.lock:
+            self.pending   -= 1
+        dispatcher.send(
+            sender = 'FakeEchoMote',
+            signal = 'fromMoteProbe@'+self.portname,
+            data   = [ord('D'),0x00,0x01,0x00,0x00,0x00,0x00,0x00]+payload,
+        )
+
+class FakeProbe(object):
+    
+    def getRxStats(self):
+        return {'numRxHdlcErrors': 3}
+
+@pytest.fixture
+def mote(request):
+    mote = FakeEchoMote(**getattr(request,'param',{}))
+    request.addfinalizer(mote.close)
+    return mote
+
+#============================ tests ===========================================
+
+def test_sweep(mote):
+    
+    tester = SerialTester.SerialTester(mote.portname,probe=FakeProbe())
+    tester.setTestPktLengths([1,10,40])
+    tester.setNumTestPkt(20)
+    tester.setWindow(4)
+    tester.test()
+    
+    report = tester.getReport()
+    json.dumps(report)
+    assert report['port']==mote.portname
+    assert [r['pktLength'] for r in report['results']]==[1,10,40]
+    for r in report['results']:
+        assert r['numSent']==r['numOk']==20
+        assert r['numTimeout']==r['numCorrupted']==r['numUnexpected']==0
+        assert r['lossRate']==0
+        assert r['bytesPerSec']>0
+        assert r['numHdlcErrors']==0
+        rtt = r['rttMs']
+        assert rtt['min']<=rtt['p50']<=rtt['p90']<=rtt['p99']<=rtt['max']
+    assert tester.getStats()['numOk']==60
+    
+    # several packets were in flight
+    assert mote.maxPending>1
+
+@pytest.mark.parametrize('mote',[{'drop':[1,5],'corrupt':[2]}],indirect=True)
+def test_lossAndCorruption(mote):
+    
+    tester = SerialTester.SerialTester(mote.portname)
+    tester.setTestPktLength(10)
+    tester.setNumTestPkt(10)
+    tester.setWindow(3)
+    tester.setTimeout(0.2)
+    tester.test()
+    
+    (r,) = tester.getReport()['results']
+    assert r['numSent']==10
+    assert r['numOk']==7
+    assert r['numCorrupted']==1
+    assert r['numTimeout']==2
+    assert r['lossRate']==0.2
+    assert 'numHdlcErrors' not in r
+
+@pytest.mark.parametrize('mote',[{'corrupt':[0]}],indirect=True)
+def test_oneInFlight(mote):
+    
+    tester = SerialTester.SerialTester(mote.portname)
+    tester.setTestPktLength(5)
+    tester.setNumTestPkt(3)
+    tester.test()
+    
+    assert tester.getStats()=={'numSent':3,'numOk':2,'numCorrupted':1,'numTimeout':0}
+    assert mote.maxPending==1
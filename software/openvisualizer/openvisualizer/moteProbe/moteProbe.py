@@ -15,6 +15,8 @@ elif os.name=='posix':  # Linux
    import glob
    import platform      # To recognize MAC OS X
 import threading
+import collections
+import struct
 
 import serial
 import socket
@@ -23,6 +25,7 @@ import sys
 
 from   pydispatch import dispatcher
 import OpenHdlc
+import moteProbeCapture
 import openvisualizer.openvisualizer_utils as u
 from   openvisualizer.moteConnector import OpenParser
 
@@ -83,31 +86,88 @@ class moteProbe(threading.Thread):
     MODE_SERIAL    = 'serial'
     MODE_EMULATED  = 'emulated'
     MODE_IOTLAB    = 'IoT-LAB'
+    MODE_REPLAY    = 'replay'
     MODE_ALL       = [
         MODE_SERIAL,
         MODE_EMULATED,
         MODE_IOTLAB,
+        MODE_REPLAY,
     ]
     
-    def __init__(self,serialport=None,emulatedMote=None,iotlabmote=None):
+    DROP_TAIL      = 'tail' # drop the frame being queued
+    DROP_HEAD      = 'head' # drop the oldest queued frame
+    DROP_ALL       = [
+        DROP_TAIL,
+        DROP_HEAD,
+    ]
+    
+    OUTPUTBUF_SIZE = 100    # default max number of frames queued towards the mote
+    
+    REQUEST_BUDGET = struct.Struct('<H')  # optional byte budget after 'R'
+    
+    IOTLAB_TCP_PORT = 20000
+    
+    RATE_PERIOD    = 1.0    # period over which RX rates are computed, in s
+    
+    def __init__(self,serialport=None,emulatedMote=None,iotlabmote=None,
+            outputBufSize=OUTPUTBUF_SIZE,dropPolicy=DROP_TAIL,burstMode=False,
+            reactor=None,replayfile=None,replaySpeed=1.0,replayStart=None,
+            captureDir=None):
+        '''
+        :param outputBufSize: Max number of frames queued towards the mote.
+        :param dropPolicy:    Which frame to drop when the queue is full, one
+                              of DROP_ALL.
+        :param burstMode:     If True and the mote advertises a byte budget in
+                              its request, write as many queued frames as fit
+                              in that budget, instead of a single frame.
+        :param reactor:       A moteProbeReactor doing the I/O of this probe.
+                              If None, the probe runs its own reading thread.
+                              Not available for emulated motes.
+        :param replayfile:    A capture file to read the bytes from, instead
+                              of a mote. Frames towards the mote are dropped.
+        :param replaySpeed:   How many times faster than captured to replay;
+                              0 replays as fast as possible.
+        :param replayStart:   Capture time (wall-clock) corresponding to the
+                              start of the replay, to keep several replayed
+                              ports aligned. Defaults to the start of the
+                              capture.
+        :param captureDir:    If set, every chunk of bytes received is
+                              recorded in a capture file in this directory.
+        '''
         
         # verify params
         if   serialport:
             assert not emulatedMote
             assert not iotlabmote
+            assert not replayfile
             self.mode             = self.MODE_SERIAL
         elif emulatedMote:
             assert not serialport
             assert not iotlabmote
+            assert not replayfile
             self.mode             = self.MODE_EMULATED
         elif iotlabmote:
             assert not serialport
             assert not emulatedMote
+            assert not replayfile
             self.mode             = self.MODE_IOTLAB
+        elif replayfile:
+            assert not serialport
+            assert not emulatedMote
+            assert not iotlabmote
+            self.mode             = self.MODE_REPLAY
         else:
             raise SystemError()
+        assert outputBufSize>0
+        assert dropPolicy in self.DROP_ALL
+        assert (not reactor) or self.mode in [self.MODE_SERIAL,self.MODE_IOTLAB]
+        assert replaySpeed>=0
         
         # store params
+        self.outputBufSize        = outputBufSize
+        self.dropPolicy           = dropPolicy
+        self.burstMode            = burstMode
+        self.reactor              = reactor
         if   self.mode==self.MODE_SERIAL:
             self.serialport       = serialport[0]
             self.baudrate         = serialport[1]
@@ -118,6 +178,11 @@ class moteProbe(threading.Thread):
         elif self.mode==self.MODE_IOTLAB:
             self.iotlabmote       = iotlabmote
             self.portname         = 'IoT-LAB{0}'.format(iotlabmote)
+        elif self.mode==self.MODE_REPLAY:
+            self.replay           = moteProbeCapture.CaptureReader(replayfile)
+            self.replaySpeed      = replaySpeed
+            self.replayStart      = replayStart
+            self.portname         = self.replay.portname
         else:
             raise SystemError()
         
@@ -132,9 +197,35 @@ class moteProbe(threading.Thread):
         self.lastRxByte           = self.hdlc.HDLC_FLAG
         self.busyReceiving        = False
         self.inputBuf             = ''
-        self.outputBuf            = []
+        self.outputBuf            = collections.deque()
         self.outputBufLock        = threading.RLock()
+        self.outputBufStats       = {
+            'numQueued':          0,
+            'numDropped':         0,
+            'numSent':            0,
+            'numRequests':        0,
+            'maxQueueDepth':      0,
+        }
         self.dataLock             = threading.Lock()
+        self.rxStatsLock          = threading.Lock()
+        self.rxStats              = {
+            'numRxBytes':         0,
+            'numRxFrames':        0,
+            'numRxHdlcErrors':    0,
+            'numOpen':            0,
+            'bytesPerSec':        0.0,
+            'framesPerSec':       0.0,
+        }
+        self.rxRateStart          = time.time()
+        self.rxRateBytes          = 0
+        self.rxRateFrames         = 0
+        if captureDir:
+            self.capture          = moteProbeCapture.CaptureWriter(
+                moteProbeCapture.captureFileName(captureDir,self.portname),
+                self.portname,
+            )
+        else:
+            self.capture          = None
         # flag to permit exit from read loop
         self.goOn                 = True
         
@@ -144,7 +235,7 @@ class moteProbe(threading.Thread):
         # give this thread a name
         self.name                 = 'moteProbe@'+self.portname
         
-        if self.mode in [self.MODE_EMULATED,self.MODE_IOTLAB]:
+        if self.mode in [self.MODE_EMULATED,self.MODE_IOTLAB,self.MODE_REPLAY]:
             # Non-daemonized moteProbe does not consistently die on close(),
             # so ensure moteProbe does not persist.
             self.daemon           = True
@@ -155,8 +246,11 @@ class moteProbe(threading.Thread):
             signal = 'fromMoteConnector@'+self.portname,
         )
     
-        # start myself
-        self.start()
+        # start myself, or have the reactor read for me
+        if self.reactor:
+            self.reactor.register(self)
+        else:
+            self.start()
     
     #======================== thread ==========================================
     
@@ -164,23 +258,14 @@ class moteProbe(threading.Thread):
         try:
             # log
             log.info("start running")
+            
+            if self.mode==self.MODE_REPLAY:
+                self._replay()
+                return
         
             while self.goOn:     # open serial port
                 
-                # log 
-                log.info("open port {0}".format(self.portname))
-                
-                if   self.mode==self.MODE_SERIAL:
-                    self.serial = serial.Serial(self.serialport,self.baudrate)
-                    self.serial.setDTR(0)
-                    self.serial.setRTS(0)
-                elif self.mode==self.MODE_EMULATED:
-                    self.serial = self.emulatedMote.bspUart
-                elif self.mode==self.MODE_IOTLAB:
-                    self.serial = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
-                    self.serial.connect((self.iotlabmote,20000))
-                else:
-                    raise SystemError()
+                self.serial = self._openPort()
                 
                 while self.goOn: # read bytes from serial port
                     try:
@@ -198,57 +283,7 @@ class moteProbe(threading.Thread):
                         time.sleep(1)
                         break
                     else:
-                        for rxByte in rxBytes:
-                            if      (
-                                        (not self.busyReceiving)             and 
-                                        self.lastRxByte==self.hdlc.HDLC_FLAG and
-                                        rxByte!=self.hdlc.HDLC_FLAG
-                                    ):
-                                # start of frame
-                                if log.isEnabledFor(logging.DEBUG):
-                                    log.debug("{0}: start of hdlc frame {1} {2}".format(self.name, u.formatStringBuf(self.hdlc.HDLC_FLAG), u.formatStringBuf(rxByte)))
-                                self.busyReceiving       = True
-                                self.inputBuf            = self.hdlc.HDLC_FLAG
-                                self.inputBuf           += rxByte
-                            elif    (
-                                        self.busyReceiving                   and
-                                        rxByte!=self.hdlc.HDLC_FLAG
-                                    ):
-                                # middle of frame
-                                
-                                self.inputBuf           += rxByte
-                            elif    (
-                                        self.busyReceiving                   and
-                                        rxByte==self.hdlc.HDLC_FLAG
-                                    ):
-                                # end of frame
-                                if log.isEnabledFor(logging.DEBUG):
-                                    log.debug("{0}: end of hdlc frame {1} ".format(self.name, u.formatStringBuf(rxByte)))
-                                self.busyReceiving       = False
-                                self.inputBuf           += rxByte
-                                
-                                try:
-                                    tempBuf = self.inputBuf
-                                    self.inputBuf        = self.hdlc.dehdlcify(self.inputBuf)
-                                    if log.isEnabledFor(logging.DEBUG):
-                                        log.debug("{0}: {2} dehdlcized input: {1}".format(self.name, u.formatStringBuf(self.inputBuf), u.formatStringBuf(tempBuf)))
-                                except OpenHdlc.HdlcException as err:
-                                    log.warning('{0}: invalid serial frame: {2} {1}'.format(self.name, err, u.formatStringBuf(tempBuf)))
-                                else:
-                                    if self.inputBuf==chr(OpenParser.OpenParser.SERFRAME_MOTE2PC_REQUEST):
-                                        with self.outputBufLock:
-                                            if self.outputBuf:
-                                                outputToWrite = self.outputBuf.pop(0)
-                                                self.serial.write(outputToWrite)
-                                    else:
-                                        # dispatch
-                                        dispatcher.send(
-                                            sender        = self.name,
-                                            signal        = 'fromMoteProbe@'+self.portname,
-                                            data          = [ord(c) for c in self.inputBuf],
-                                        )
-                            
-                            self.lastRxByte = rxByte
+                        self._parseRxBytes(rxBytes)
                         
                     if self.mode==self.MODE_EMULATED:
                         self.serial.doneReading()
@@ -268,15 +303,214 @@ class moteProbe(threading.Thread):
         with self.dataLock:
             return self.baudrate
     
+    def getRxStats(self):
+        '''
+        :returns: The bytes and frames received from the mote, in total and
+                  per second, the number of frames with an invalid HDLC
+                  framing or CRC, and the number of times the port was
+                  opened.
+        '''
+        with self.rxStatsLock:
+            self._updateRxRates()
+            returnVal = self.rxStats.copy()
+        returnVal['portname'] = self.portname
+        return returnVal
+    
+    def getOutputBufStats(self):
+        '''
+        :returns: The depth of the queue towards the mote, and its counters.
+        '''
+        with self.outputBufLock:
+            returnVal = self.outputBufStats.copy()
+            returnVal['queueDepth'] = len(self.outputBuf)
+        returnVal['portname']       = self.portname
+        return returnVal
+    
     def close(self):
         self.goOn = False
+        if self.reactor:
+            self.reactor.unregister(self)
+        if self.capture:
+            self.capture.close()
     
     #======================== private =========================================
     
+    def _openPort(self,blocking=True):
+        '''
+        Open the serial port, or the TCP connection to the IoT-LAB mote.
+        
+        :param blocking: If False, the port is opened for non-blocking
+                         reads, and the TCP connection is only initiated;
+                         the caller must wait for the socket to be writable.
+        '''
+        
+        # log 
+        log.info("open port {0}".format(self.portname))
+        
+        if   self.mode==self.MODE_SERIAL:
+            port = serial.Serial(self.serialport,self.baudrate,timeout=None if blocking else 0)
+            port.setDTR(0)
+            port.setRTS(0)
+        elif self.mode==self.MODE_EMULATED:
+            port = self.emulatedMote.bspUart
+        elif self.mode==self.MODE_IOTLAB:
+            port = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+            if blocking:
+                port.connect((self.iotlabmote,self.IOTLAB_TCP_PORT))
+            else:
+                port.setblocking(0)
+                port.connect_ex((self.iotlabmote,self.IOTLAB_TCP_PORT))
+        else:
+            raise SystemError()
+        
+        with self.rxStatsLock:
+            self.rxStats['numOpen'] += 1
+        
+        return port
+    
+    def _parseRxBytes(self,rxBytes):
+        '''
+        Feed bytes received from the mote to the HDLC deframer.
+        
+        The deframer state is kept between calls, so bytes can be passed in
+        chunks of any size.
+        '''
+        
+        numFrames = 0
+        numErrors = 0
+        
+        if self.capture:
+            self.capture.write(rxBytes)
+        
+        for rxByte in rxBytes:
+            if      (
+                        (not self.busyReceiving)             and 
+                        self.lastRxByte==self.hdlc.HDLC_FLAG and
+                        rxByte!=self.hdlc.HDLC_FLAG
+                    ):
+                # start of frame
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("{0}: start of hdlc frame {1} {2}".format(self.name, u.formatStringBuf(self.hdlc.HDLC_FLAG), u.formatStringBuf(rxByte)))
+                self.busyReceiving       = True
+                self.inputBuf            = self.hdlc.HDLC_FLAG
+                self.inputBuf           += rxByte
+            elif    (
+                        self.busyReceiving                   and
+                        rxByte!=self.hdlc.HDLC_FLAG
+                    ):
+                # middle of frame
+                
+                self.inputBuf           += rxByte
+            elif    (
+                        self.busyReceiving                   and
+                        rxByte==self.hdlc.HDLC_FLAG
+                    ):
+                # end of frame
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("{0}: end of hdlc frame {1} ".format(self.name, u.formatStringBuf(rxByte)))
+                self.busyReceiving       = False
+                self.inputBuf           += rxByte
+                numFrames               += 1
+                
+                try:
+                    tempBuf = self.inputBuf
+                    self.inputBuf        = self.hdlc.dehdlcify(self.inputBuf)
+                    if log.isEnabledFor(logging.DEBUG):
+                        log.debug("{0}: {2} dehdlcized input: {1}".format(self.name, u.formatStringBuf(self.inputBuf), u.formatStringBuf(tempBuf)))
+                except OpenHdlc.HdlcException as err:
+                    log.warning('{0}: invalid serial frame: {2} {1}'.format(self.name, err, u.formatStringBuf(tempBuf)))
+                    numErrors               += 1
+                else:
+                    if self.inputBuf[:1]==chr(OpenParser.OpenParser.SERFRAME_MOTE2PC_REQUEST):
+                        self._handleRequest(self.inputBuf)
+                    else:
+                        # dispatch
+                        dispatcher.send(
+                            sender        = self.name,
+                            signal        = 'fromMoteProbe@'+self.portname,
+                            data          = [ord(c) for c in self.inputBuf],
+                        )
+            
+            self.lastRxByte = rxByte
+        
+        with self.rxStatsLock:
+            self.rxStats['numRxBytes']  += len(rxBytes)
+            self.rxStats['numRxFrames'] += numFrames
+            self.rxStats['numRxHdlcErrors'] += numErrors
+            self._updateRxRates()
+    
+    def _replay(self):
+        '''
+        Feed the bytes of the capture file to the HDLC deframer, paced as
+        captured (scaled by replaySpeed), or as fast as possible.
+        '''
+        
+        self.serial     = None
+        replayStart     = self.replayStart
+        if replayStart is None:
+            replayStart = self.replay.startTime
+        originTime      = time.time()
+        
+        for (timestamp,rxBytes) in self.replay:
+            if not self.goOn:
+                break
+            if self.replaySpeed:
+                delay = originTime+(self.replay.startTime+timestamp-replayStart)/self.replaySpeed-time.time()
+                if delay>0:
+                    time.sleep(delay)
+            self._parseRxBytes(rxBytes)
+        
+        # log
+        log.info("{0}: done replaying {1}".format(self.name,self.replay.filename))
+    
+    def _updateRxRates(self):
+        '''
+        Recompute the RX rates once every RATE_PERIOD. Call with rxStatsLock
+        held.
+        '''
+        now     = time.time()
+        elapsed = now-self.rxRateStart
+        if elapsed<self.RATE_PERIOD:
+            return
+        self.rxStats['bytesPerSec']  = (self.rxStats['numRxBytes'] -self.rxRateBytes)/elapsed
+        self.rxStats['framesPerSec'] = (self.rxStats['numRxFrames']-self.rxRateFrames)/elapsed
+        self.rxRateStart             = now
+        self.rxRateBytes             = self.rxStats['numRxBytes']
+        self.rxRateFrames            = self.rxStats['numRxFrames']
+    
+    def _handleRequest(self,request):
+        '''
+        Write queued frames to the mote, which requested them.
+        
+        A request is the single byte 'R', optionally followed by the number of
+        bytes the mote can receive (little-endian 16-bit). In burst mode, all
+        queued frames fitting in that budget are written at once; otherwise a
+        single frame is written.
+        '''
+        
+        budget = None
+        if self.burstMode and len(request)>=1+self.REQUEST_BUDGET.size:
+            (budget,) = self.REQUEST_BUDGET.unpack_from(request,1)
+        
+        with self.outputBufLock:
+            self.outputBufStats['numRequests'] += 1
+            
+            if budget is None:
+                toWrite = [self.outputBuf.popleft()] if self.outputBuf else []
+            else:
+                toWrite = []
+                while self.outputBuf and len(self.outputBuf[0])<=budget:
+                    budget  -= len(self.outputBuf[0])
+                    toWrite += [self.outputBuf.popleft()]
+            
+            if toWrite:
+                self.serial.write(''.join(toWrite))
+                self.outputBufStats['numSent'] += len(toWrite)
+    
     def _bufferDataToSend(self,data):
         
-        # abort for IoT-LAB
-        if self.mode==self.MODE_IOTLAB:
+        # abort for IoT-LAB and replay
+        if self.mode in [self.MODE_IOTLAB,self.MODE_REPLAY]:
             return
         
         # frame with HDLC
@@ -284,4 +518,16 @@ class moteProbe(threading.Thread):
         
         # add to outputBuf
         with self.outputBufLock:
-            self.outputBuf += [hdlcData]
+            if len(self.outputBuf)>=self.outputBufSize:
+                self.outputBufStats['numDropped'] += 1
+                if self.dropPolicy==self.DROP_TAIL:
+                    log.warning('{0}: output buffer full, dropping frame'.format(self.name))
+                    return
+                self.outputBuf.popleft()
+                log.warning('{0}: output buffer full, dropping oldest frame'.format(self.name))
+            self.outputBuf.append(hdlcData)
+            self.outputBufStats['numQueued'] += 1
+            self.outputBufStats['maxQueueDepth'] = max(
+                self.outputBufStats['maxQueueDepth'],
+                len(self.outputBuf),
+            )
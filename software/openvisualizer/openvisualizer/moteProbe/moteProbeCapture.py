@@ -0,0 +1,159 @@
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+'''
+Capture of the raw bytes received from a mote, for later replay.
+
+A capture file holds the bytes of a single port. It starts with a header:
+
+- the magic string ``OWCAP``, followed by the format version (1 byte)
+- the wall-clock time the capture started (double, little-endian)
+- the length of the port name (unsigned short) followed by the port name
+
+followed by one record per chunk of bytes read from the port:
+
+- the time elapsed since the previous record, in microseconds (unsigned int)
+- the number of bytes in the chunk (unsigned short) followed by the bytes
+
+The timestamps never go backwards, even if the system clock does.
+'''
+
+import logging
+log = logging.getLogger('moteProbeCapture')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import os
+import re
+import struct
+import threading
+import time
+
+class CaptureException(Exception):
+    pass
+
+MAGIC          = 'OWCAP'
+VERSION        = 1
+HEADER         = struct.Struct('<5sBdH')
+RECORD         = struct.Struct('<IH')
+MAX_CHUNK      = 0xffff
+MAX_DELTA      = 0xffffffff # us
+EXTENSION      = '.owcap'
+
+def captureFileName(directory,portname):
+    '''
+    :returns: The name of the capture file of a port in a directory, e.g.
+              'dev_ttyUSB0.owcap' for '/dev/ttyUSB0'.
+    '''
+    return os.path.join(
+        directory,
+        re.sub('[^A-Za-z0-9.-]+','_',portname).strip('_')+EXTENSION,
+    )
+
+class CaptureWriter(object):
+    '''
+    Appends the chunks of bytes received on a port to a capture file.
+    '''
+    
+    def __init__(self,filename,portname):
+        
+        # store params
+        self.filename             = filename
+        self.portname             = portname
+        
+        # local variables
+        self.dataLock             = threading.Lock()
+        self.startTime            = time.time()
+        self.lastTime             = self.startTime
+        self.numChunks            = 0
+        self.numBytes             = 0
+        self.file                 = open(filename,'wb')
+        
+        self.file.write(HEADER.pack(MAGIC,VERSION,self.startTime,len(portname)))
+        self.file.write(portname)
+        
+        # log
+        log.info("capturing {0} into {1}".format(portname,filename))
+    
+    #======================== public ==========================================
+    
+    def write(self,rxBytes):
+        '''
+        Record a chunk of bytes, timestamped now.
+        '''
+        with self.dataLock:
+            if self.file is None:
+                return
+            
+            now   = time.time()
+            delta = int(round((now-self.lastTime)*1000000))
+            if delta<0:
+                # clock went backwards, keep timestamps monotonic
+                delta = 0
+            else:
+                self.lastTime = now
+            
+            for i in range(0,len(rxBytes),MAX_CHUNK):
+                chunk = rxBytes[i:i+MAX_CHUNK]
+                self.file.write(RECORD.pack(min(delta,MAX_DELTA),len(chunk)))
+                self.file.write(chunk)
+                delta = 0
+            
+            self.numChunks       += 1
+            self.numBytes        += len(rxBytes)
+    
+    def close(self):
+        with self.dataLock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+        
+        # log
+        log.info("captured {0} chunks, {1} bytes from {2}".format(
+                self.numChunks,
+                self.numBytes,
+                self.portname,
+            )
+        )
+
+class CaptureReader(object):
+    '''
+    Reads back a capture file.
+    
+    Iterating over the reader yields ``(timestamp,bytes)`` tuples, where
+    timestamp is the time of the chunk relative to ``startTime``, in seconds.
+    '''
+    
+    def __init__(self,filename):
+        
+        # store params
+        self.filename             = filename
+        
+        # read header
+        with open(filename,'rb') as f:
+            header = f.read(HEADER.size)
+            if len(header)<HEADER.size:
+                raise CaptureException('{0}: truncated header'.format(filename))
+            (magic,version,self.startTime,portnameLen) = HEADER.unpack(header)
+            if magic!=MAGIC or version!=VERSION:
+                raise CaptureException('{0}: not a version {1} capture file'.format(filename,VERSION))
+            self.portname         = f.read(portnameLen)
+            self.dataOffset       = f.tell()
+    
+    def __iter__(self):
+        timestamp = 0
+        with open(self.filename,'rb') as f:
+            f.seek(self.dataOffset)
+            while True:
+                record = f.read(RECORD.size)
+                if len(record)<RECORD.size:
+                    # end of file, or record cut short by a crash
+                    break
+                (delta,length) = RECORD.unpack(record)
+                chunk = f.read(length)
+                if len(chunk)<length:
+                    break
+                timestamp += delta/1000000.0
+                yield (timestamp,chunk)
@@ -0,0 +1,204 @@
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+import logging
+log = logging.getLogger('moteProbeReactor')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import threading
+import select
+import socket
+import errno
+import time
+import sys
+
+import openvisualizer.openvisualizer_utils as u
+
+class moteProbeReactor(threading.Thread):
+    '''
+    Single thread doing the I/O of many moteProbes.
+    
+    Instead of each moteProbe running its own thread blocked on a read, the
+    probes created with ``reactor=<this reactor>`` register their serial port
+    or IoT-LAB TCP socket here, and this thread multiplexes all of them with
+    ``select``. Received bytes are fed to each probe's incremental HDLC
+    deframer. Ports which fail (e.g. a dropped IoT-LAB connection) are
+    re-opened with exponential backoff.
+    
+    Serial ports can only be multiplexed on POSIX systems.
+    '''
+    
+    STATE_CLOSED      = 'closed'
+    STATE_CONNECTING  = 'connecting'
+    STATE_OPEN        = 'open'
+    
+    BACKOFF_MIN       = 1.0     # s
+    BACKOFF_MAX       = 30.0    # s
+    SELECT_TIMEOUT    = 0.5     # s
+    RECV_SIZE         = 4096
+    
+    def __init__(self,backoffMin=BACKOFF_MIN,backoffMax=BACKOFF_MAX):
+        
+        # log
+        log.info("creating instance")
+        
+        # store params
+        self.backoffMin           = backoffMin
+        self.backoffMax           = backoffMax
+        
+        # local variables
+        self.dataLock             = threading.RLock()
+        self.ports                = {}  # probe -> port record
+        self.goOn                 = True
+        
+        # initialize the parent class
+        threading.Thread.__init__(self)
+        
+        # give this thread a name
+        self.name                 = 'moteProbeReactor'
+        self.daemon               = True
+        
+        # start myself
+        self.start()
+    
+    #======================== thread ==========================================
+    
+    def run(self):
+        try:
+            # log
+            log.info("start running")
+            
+            while self.goOn:
+                
+                # open the ports due for (re)connection
+                now = time.time()
+                with self.dataLock:
+                    records = self.ports.values()
+                for r in records:
+                    if r['state']==self.STATE_CLOSED and now>=r['retryAt']:
+                        self._open(r)
+                
+                # wait for I/O
+                rlist = []
+                wlist = []
+                for r in records:
+                    if   r['state']==self.STATE_OPEN:
+                        rlist += [r['port']]
+                    elif r['state']==self.STATE_CONNECTING:
+                        wlist += [r['port']]
+                byPort = dict((r['port'],r) for r in records if r['port'] is not None)
+                
+                if not (rlist or wlist):
+                    time.sleep(self.SELECT_TIMEOUT)
+                    continue
+                
+                try:
+                    (readable,writable,_) = select.select(rlist,wlist,[],self.SELECT_TIMEOUT)
+                except (select.error,socket.error,ValueError) as err:
+                    # one of the ports was closed under us; find it next round
+                    log.warning('select failed: {0}'.format(err))
+                    for r in records:
+                        if r['state']!=self.STATE_CLOSED and self._isBroken(r['port']):
+                            self._fail(r,err)
+                    continue
+                
+                for port in writable:
+                    self._connected(byPort[port])
+                for port in readable:
+                    self._read(byPort[port])
+        
+        except Exception as err:
+            errMsg=u.formatCrashMessage(self.name,err)
+            print errMsg
+            log.critical(errMsg)
+            sys.exit(-1)
+    
+    #======================== public ==========================================
+    
+    def register(self,probe):
+        with self.dataLock:
+            self.ports[probe] = {
+                'probe':          probe,
+                'port':           None,
+                'state':          self.STATE_CLOSED,
+                'retryAt':        0,
+                'backoff':        self.backoffMin,
+            }
+    
+    def unregister(self,probe):
+        with self.dataLock:
+            r = self.ports.pop(probe,None)
+        if r and r['port'] is not None:
+            self._close(r)
+    
+    def close(self):
+        self.goOn = False
+        with self.dataLock:
+            probes = self.ports.keys()
+        for probe in probes:
+            self.unregister(probe)
+    
+    #======================== private =========================================
+    
+    def _open(self,r):
+        probe = r['probe']
+        try:
+            r['port']  = probe._openPort(blocking=False)
+        except Exception as err:
+            self._fail(r,err)
+            return
+        if probe.mode==probe.MODE_IOTLAB:
+            r['state'] = self.STATE_CONNECTING
+        else:
+            self._connected(r)
+    
+    def _connected(self,r):
+        probe = r['probe']
+        if r['state']==self.STATE_CONNECTING:
+            err = r['port'].getsockopt(socket.SOL_SOCKET,socket.SO_ERROR)
+            if err:
+                self._fail(r,socket.error(err,errno.errorcode.get(err,'')))
+                return
+        log.info('{0} open'.format(probe.name))
+        probe.serial   = r['port']
+        r['state']     = self.STATE_OPEN
+        r['backoff']   = self.backoffMin
+    
+    def _read(self,r):
+        probe = r['probe']
+        try:
+            if probe.mode==probe.MODE_IOTLAB:
+                rxBytes = r['port'].recv(self.RECV_SIZE)
+                if not rxBytes:
+                    raise socket.error('connection closed by peer')
+            else:
+                rxBytes = r['port'].read(r['port'].inWaiting() or 1)
+        except Exception as err:
+            self._fail(r,err)
+            return
+        probe._parseRxBytes(rxBytes)
+    
+    def _fail(self,r,err):
+        log.warning('{0}: {1}, retrying in {2}s'.format(r['probe'].name,err,r['backoff']))
+        self._close(r)
+        r['retryAt']   = time.time()+r['backoff']
+        r['backoff']   = min(r['backoff']*2,self.backoffMax)
+    
+    def _close(self,r):
+        try:
+            if r['port'] is not None:
+                r['port'].close()
+        except Exception as err:
+            log.warning('{0}: error closing port: {1}'.format(r['probe'].name,err))
+        r['port']      = None
+        r['state']     = self.STATE_CLOSED
+    
+    def _isBroken(self,port):
+        try:
+            select.select([port],[],[],0)
+        except (select.error,socket.error,ValueError):
+            return True
+        return False
@@ -0,0 +1,96 @@
+'''
+Benchmark of the whole upstream pipeline, driven by replaying captures.
+
+Replays capture files (recorded with 'openVisualizerApp --capture <dir>') as
+fast as possible through moteProbe, moteConnector, moteState, OpenLbr and RPL,
+and prints the number of bytes and frames processed per second. Without
+capture files, a synthetic capture of status frames is generated and
+replayed.
+
+Run this benchmark by double-clicking on this file, or with
+'python bench_replay.py [captureFile ...]'.
+'''
+
+import sys
+import os
+if __name__=='__main__':
+    here = sys.path[0]
+    sys.path.insert(0, os.path.join(here, '..', '..', '..'))                     # root/
+    sys.path.insert(0, os.path.join(here, '..'))                                 # moteProbe/
+
+import shutil
+import struct
+import tempfile
+import time
+
+import moteProbe
+import moteProbeCapture
+import OpenHdlc
+from   openvisualizer.moteConnector import moteConnector
+from   openvisualizer.moteState     import moteState
+from   openvisualizer.openLbr       import openLbr
+from   openvisualizer.RPL           import RPL
+
+#============================ defines =========================================
+
+NUM_FRAMES_SYNTHETIC = 20000
+PORTNAME_SYNTHETIC   = 'synthetic'
+
+#============================ helpers =========================================
+
+def writeSyntheticCapture(directory):
+    '''
+    Capture of ASN, MyDagRank and MacStats status frames from mote 0x0001,
+    read from the port in chunks of a few frames.
+    '''
+    hdlc     = OpenHdlc.OpenHdlc()
+    frames   = [
+        'S'+struct.pack('<HB',0x0001,4)+struct.pack('<BHH',0,0,i)                      for i in range(3)
+    ]+[
+        'S'+struct.pack('<HB',0x0001,2)+struct.pack('<H',256),
+        'S'+struct.pack('<HB',0x0001,5)+struct.pack('<BBhhBII',1,2,-3,4,0,100,1000),
+    ]
+    chunk    = ''.join(hdlc.hdlcify(f) for f in frames)
+    filename = moteProbeCapture.captureFileName(directory,PORTNAME_SYNTHETIC)
+    writer   = moteProbeCapture.CaptureWriter(filename,PORTNAME_SYNTHETIC)
+    for _ in xrange(NUM_FRAMES_SYNTHETIC/len(frames)):
+        writer.write(chunk)
+    writer.close()
+    return filename
+
+#============================ main ============================================
+
+def main():
+    
+    tempDir = None
+    if len(sys.argv)>1:
+        captureFiles = sys.argv[1:]
+    else:
+        tempDir      = tempfile.mkdtemp()
+        captureFiles = [writeSyntheticCapture(tempDir)]
+    
+    try:
+        openLbr.OpenLbr()
+        RPL.RPL()
+        
+        readers   = [moteProbeCapture.CaptureReader(f) for f in captureFiles]
+        for r in readers:
+            moteState.moteState(moteConnector.moteConnector(r.portname))
+        
+        startTime = time.time()
+        probes    = [moteProbe.moteProbe(replayfile=f,replaySpeed=0) for f in captureFiles]
+        for p in probes:
+            p.join()
+        duration  = time.time()-startTime
+        
+        numBytes  = sum(p.getRxStats()['numRxBytes']  for p in probes)
+        numFrames = sum(p.getRxStats()['numRxFrames'] for p in probes)
+        print '{0} port(s), {1} frames in {2:.2f}s'.format(len(probes),numFrames,duration)
+        print '{0:>10.0f} bytes/s'.format(numBytes/duration)
+        print '{0:>10.0f} frames/s'.format(numFrames/duration)
+    finally:
+        if tempDir:
+            shutil.rmtree(tempDir)
+
+if __name__=="__main__":
+    main()
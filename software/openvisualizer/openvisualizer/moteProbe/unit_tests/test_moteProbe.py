@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))               # root/
+sys.path.insert(0, os.path.join(here, '..'))                           # moteProbe/
+
+import threading
+import time
+
+import pytest
+
+import moteProbe
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_moteProbe.log'
+
+import logging
+log = logging.getLogger('test_moteProbe')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  maxBytes=2*1024*1024,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in   [
+                        'test_moteProbe',
+                        'moteProbe',
+                    ]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ helpers =========================================
+
+class FakeUart(object):
+    '''
+    Stands for the BspUart of an emulated mote; never returns any byte.
+    '''
+    
+    def __init__(self):
+        self.written = []
+        self.never   = threading.Event()
+    
+    def read(self):
+        self.never.wait()
+    
+    def write(self,bytesToWrite):
+        self.written += [bytesToWrite]
+
+class FakeEmulatedMote(object):
+    
+    def __init__(self,id):
+        self.id       = id
+        self.bspUart  = FakeUart()
+    
+    def getId(self):
+        return self.id
+
+_nextId = [0]
+
+def createProbe(**kwargs):
+    _nextId[0] += 1
+    mote  = FakeEmulatedMote(_nextId[0])
+    probe = moteProbe.moteProbe(emulatedMote=mote,**kwargs)
+    while not hasattr(probe,'serial'):
+        time.sleep(0.01)
+    return (probe,mote.bspUart)
+
+def request(budget=None):
+    if budget is None:
+        return 'R'
+    return 'R'+moteProbe.moteProbe.REQUEST_BUDGET.pack(budget)
+
+#============================ tests ===========================================
+
+def test_oneFramePerRequest():
+    
+    (probe,uart) = createProbe()
+    
+    for i in range(3):
+        probe._bufferDataToSend(chr(i)*10)
+    
+    probe._handleRequest(request())
+    probe._handleRequest(request(1000))   # budget ignored, not in burst mode
+    
+    assert len(uart.written)==2
+    assert probe.getOutputBufStats()['queueDepth']==1
+    assert probe.getOutputBufStats()['numSent']==2
+
+def test_dropTail():
+    
+    (probe,uart) = createProbe(outputBufSize=2,dropPolicy=moteProbe.moteProbe.DROP_TAIL)
+    
+    for i in range(5):
+        probe._bufferDataToSend(chr(i)*10)
+    
+    stats = probe.getOutputBufStats()
+    assert stats['queueDepth']==2
+    assert stats['numDropped']==3
+    assert stats['maxQueueDepth']==2
+    
+    probe._handleRequest(request())
+    assert uart.written==[probe.hdlc.hdlcify(chr(0)*10)]
+
+def test_dropHead():
+    
+    (probe,uart) = createProbe(outputBufSize=2,dropPolicy=moteProbe.moteProbe.DROP_HEAD)
+    
+    for i in range(5):
+        probe._bufferDataToSend(chr(i)*10)
+    
+    assert probe.getOutputBufStats()['numDropped']==3
+    
+    probe._handleRequest(request())
+    assert uart.written==[probe.hdlc.hdlcify(chr(3)*10)]
+
+def test_burst():
+    
+    (probe,uart) = createProbe(burstMode=True)
+    
+    frames = [probe.hdlc.hdlcify(chr(i)*10) for i in range(4)]
+    for i in range(4):
+        probe._bufferDataToSend(chr(i)*10)
+    
+    # room for 2 frames and a half
+    probe._handleRequest(request(len(frames[0])*5/2))
+    assert uart.written==[frames[0]+frames[1]]
+    
+    # no budget advertised: single frame
+    probe._handleRequest(request())
+    assert uart.written[-1]==frames[2]
+    
+    # budget too small for the next frame
+    probe._handleRequest(request(1))
+    assert len(uart.written)==2
+    assert probe.getOutputBufStats()['queueDepth']==1
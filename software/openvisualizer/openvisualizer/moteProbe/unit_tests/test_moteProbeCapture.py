@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))               # root/
+sys.path.insert(0, os.path.join(here, '..'))                           # moteProbe/
+
+import time
+
+import pytest
+
+from pydispatch import dispatcher
+
+import moteProbe
+import moteProbeCapture
+import OpenHdlc
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_moteProbeCapture.log'
+
+import logging
+log = logging.getLogger('test_moteProbeCapture')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  maxBytes=2*1024*1024,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in   [
+                        'test_moteProbeCapture',
+                        'moteProbe',
+                        'moteProbeCapture',
+                    ]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+PORTNAME = '/dev/ttyUSB0'
+
+#============================ helpers =========================================
+
+def writeCapture(directory,chunks,period=0):
+    filename = moteProbeCapture.captureFileName(str(directory),PORTNAME)
+    writer   = moteProbeCapture.CaptureWriter(filename,PORTNAME)
+    for chunk in chunks:
+        writer.write(chunk)
+        time.sleep(period)
+    writer.close()
+    return filename
+
+def replay(filename,**kwargs):
+    received = []
+    def _rx_cb(signal,sender,data):
+        received.append(data)
+    dispatcher.connect(_rx_cb,signal='fromMoteProbe@'+PORTNAME)
+    try:
+        startTime = time.time()
+        probe     = moteProbe.moteProbe(replayfile=filename,**kwargs)
+        probe.join()
+        duration  = time.time()-startTime
+    finally:
+        dispatcher.disconnect(_rx_cb,signal='fromMoteProbe@'+PORTNAME)
+    return (probe,received,duration)
+
+#============================ tests ===========================================
+
+def test_captureFileName():
+    assert os.path.basename(moteProbeCapture.captureFileName('.','/dev/ttyUSB0'))=='dev_ttyUSB0.owcap'
+    assert os.path.basename(moteProbeCapture.captureFileName('.','IoT-LABwsn430-9'))=='IoT-LABwsn430-9.owcap'
+
+def test_roundtrip(tmpdir):
+    
+    chunks   = ['\x7e', 'abc', '', '\x00'*(moteProbeCapture.MAX_CHUNK+10)]
+    filename = writeCapture(tmpdir,chunks)
+    
+    reader   = moteProbeCapture.CaptureReader(filename)
+    assert reader.portname==PORTNAME
+    
+    records  = list(reader)
+    assert ''.join(c for (_,c) in records)==''.join(chunks)
+    timestamps = [t for (t,_) in records]
+    assert timestamps==sorted(timestamps)
+
+def test_truncatedRecord(tmpdir):
+    
+    filename = writeCapture(tmpdir,['abc','defg'])
+    with open(filename,'r+b') as f:
+        f.truncate(os.path.getsize(filename)-1)
+    
+    assert [c for (_,c) in moteProbeCapture.CaptureReader(filename)]==['abc']
+
+def test_notACapture(tmpdir):
+    
+    filename = str(tmpdir.join('bad.owcap'))
+    with open(filename,'wb') as f:
+        f.write('this is not a capture file')
+    
+    with pytest.raises(moteProbeCapture.CaptureException):
+        moteProbeCapture.CaptureReader(filename)
+
+def test_replayFrames(tmpdir):
+    
+    hdlc     = OpenHdlc.OpenHdlc()
+    stream   = hdlc.hdlcify('D\x01\x02')+hdlc.hdlcify('R')+hdlc.hdlcify('S\x03')
+    filename = writeCapture(tmpdir,[stream[:4],stream[4:]])
+    
+    (probe,received,_) = replay(filename,replaySpeed=0)
+    
+    assert received==[[ord('D'),0x01,0x02],[ord('S'),0x03]]
+    assert probe.getRxStats()['numRxBytes']==len(stream)
+    assert probe.getOutputBufStats()['numRequests']==1
+
+def test_replayPacing(tmpdir):
+    
+    hdlc     = OpenHdlc.OpenHdlc()
+    filename = writeCapture(tmpdir,[hdlc.hdlcify('D\x01')]*5,period=0.1)
+    
+    (_,received,duration) = replay(filename,replaySpeed=0)
+    assert len(received)==5
+    assert duration<0.2
+    
+    (_,received,duration) = replay(filename,replaySpeed=2)
+    assert len(received)==5
+    assert duration>=0.2
+
+def test_captureFromProbe(tmpdir):
+    
+    hdlc     = OpenHdlc.OpenHdlc()
+    probe    = moteProbe.moteProbe(
+        replayfile = writeCapture(tmpdir.mkdir('in'),[hdlc.hdlcify('D\x01\x02')]),
+        replaySpeed= 0,
+        captureDir = str(tmpdir.mkdir('out')),
+    )
+    probe.join()
+    probe.close()
+    
+    (_,received,_) = replay(moteProbeCapture.captureFileName(str(tmpdir.join('out')),PORTNAME),replaySpeed=0)
+    assert received==[[ord('D'),0x01,0x02]]
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))               # root/
+sys.path.insert(0, os.path.join(here, '..'))                           # moteProbe/
+
+import socket
+import time
+
+import pytest
+
+from pydispatch import dispatcher
+
+import moteProbe
+import moteProbeReactor
+import OpenHdlc
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_moteProbeReactor.log'
+
+import logging
+log = logging.getLogger('test_moteProbeReactor')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  maxBytes=2*1024*1024,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in   [
+                        'test_moteProbeReactor',
+                        'moteProbe',
+                        'moteProbeReactor',
+                    ]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+TIMEOUT = 5
+
+#============================ helpers =========================================
+
+def waitFor(condition):
+    start = time.time()
+    while not condition():
+        assert time.time()-start<TIMEOUT
+        time.sleep(0.01)
+
+def createServer():
+    server = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+    server.bind(('127.0.0.1',0))
+    server.listen(1)
+    server.settimeout(TIMEOUT)
+    return server
+
+def createProbe(server,reactor):
+    
+    class LocalIotlabProbe(moteProbe.moteProbe):
+        IOTLAB_TCP_PORT = server.getsockname()[1]
+    
+    return LocalIotlabProbe(iotlabmote='127.0.0.1',reactor=reactor)
+
+#============================ tests ===========================================
+
+def test_reactorReceiveAndReconnect():
+    
+    hdlc     = OpenHdlc.OpenHdlc()
+    server   = createServer()
+    reactor  = moteProbeReactor.moteProbeReactor(backoffMin=0.05)
+    probe    = createProbe(server,reactor)
+    
+    received = []
+    def _rx_cb(signal,sender,data):
+        received.append(data)
+    dispatcher.connect(_rx_cb,signal='fromMoteProbe@'+probe.getPortName())
+    
+    try:
+        # frames split over several TCP segments
+        (conn,_) = server.accept()
+        stream   = hdlc.hdlcify('D\x01\x02')+hdlc.hdlcify('S\x03')
+        conn.sendall(stream[:3])
+        time.sleep(0.05)
+        conn.sendall(stream[3:])
+        waitFor(lambda: len(received)==2)
+        assert received==[[ord('D'),0x01,0x02],[ord('S'),0x03]]
+        
+        # the reactor reconnects after the connection drops
+        conn.close()
+        (conn,_) = server.accept()
+        conn.sendall(hdlc.hdlcify('D\x04'))
+        waitFor(lambda: len(received)==3)
+        assert received[-1]==[ord('D'),0x04]
+        
+        stats = probe.getRxStats()
+        assert stats['numRxFrames']==3
+        assert stats['numRxBytes']==len(stream)+len(hdlc.hdlcify('D\x04'))
+        assert stats['numOpen']==2
+        conn.close()
+    finally:
+        dispatcher.disconnect(_rx_cb,signal='fromMoteProbe@'+probe.getPortName())
+        probe.close()
+        reactor.close()
+        server.close()
@@ -0,0 +1,324 @@
+# Copyright (c) 2010-2013, Regents of the University of California. 
+# All rights reserved. 
+#  
+# Released under the BSD 3-Clause license as published at the link below.
+# https://openwsn.atlassian.net/wiki/display/OW/License
+'''
+Keeps the recent history of selected numeric fields of the mote state.
+
+Each series (one field of one mote) is stored in fixed-size ring buffers
+backed by ``array.array``: one with the raw samples, and one per downsampling
+tier holding the average of the samples over consecutive periods. Memory is
+therefore allocated once per series and does not grow over time.
+'''
+import logging
+log = logging.getLogger('StateHistory')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+import array
+import threading
+import time
+
+from openvisualizer.eventBus      import eventBusClient
+
+#============================ ring buffers ====================================
+
+class RingBuffer(object):
+    '''
+    The last ``size`` (timestamp,value) samples of a series.
+    '''
+    
+    __slots__ = ['times','values','size','next','count']
+    
+    def __init__(self,size):
+        self.times                = array.array('d',[0.0])*size
+        self.values               = array.array('f',[0.0])*size
+        self.size                 = size
+        self.next                 = 0
+        self.count                = 0
+    
+    def append(self,timestamp,value):
+        self.times[self.next]     = timestamp
+        self.values[self.next]    = value
+        self.next                 = (self.next+1)%self.size
+        self.count                = min(self.count+1,self.size)
+    
+    def getRange(self,start,end):
+        '''
+        :returns: The (times,values) lists of the samples in [start,end].
+        '''
+        times     = []
+        values    = []
+        first     = (self.next-self.count)%self.size
+        for i in xrange(self.count):
+            j     = (first+i)%self.size
+            t     = self.times[j]
+            if start<=t<=end:
+                times.append(t)
+                values.append(self.values[j])
+        return (times,values)
+
+class DownsampledRingBuffer(object):
+    '''
+    The averages of a series over its last ``size`` periods of ``period``
+    seconds.
+    
+    Period ``p`` (covering ``[p*period,(p+1)*period)``) is stored at index
+    ``p%size``, so the timestamps are implicit. Periods without samples are
+    not returned.
+    '''
+    
+    __slots__ = ['period','values','counts','size','lastPeriod','sum','num']
+    
+    def __init__(self,period,size):
+        self.period               = period
+        self.values               = array.array('f',[0.0])*size
+        self.counts               = array.array('H',[0])*size
+        self.size                 = size
+        self.lastPeriod           = None
+        self.sum                  = 0.0
+        self.num                  = 0
+    
+    def append(self,timestamp,value):
+        p = int(timestamp//self.period)
+        if self.lastPeriod is None:
+            self.lastPeriod = p
+        elif p>self.lastPeriod:
+            # close the current period, mark the ones without samples
+            self._store()
+            for skipped in xrange(self.lastPeriod+1,min(p,self.lastPeriod+1+self.size)):
+                self.counts[skipped%self.size] = 0
+            self.lastPeriod = p
+            self.sum        = 0.0
+            self.num        = 0
+        elif p<self.lastPeriod:
+            # clock went backwards, account in the current period
+            pass
+        self.sum  += value
+        self.num  += 1
+    
+    def getRange(self,start,end):
+        '''
+        :returns: The (times,values) lists of the periods starting in
+                  [start,end], including the current (incomplete) one.
+        '''
+        times     = []
+        values    = []
+        if self.lastPeriod is None:
+            return (times,values)
+        self._store()
+        first     = max(self.lastPeriod-self.size+1,int(start//self.period))
+        for p in xrange(first,self.lastPeriod+1):
+            t     = p*self.period
+            if t>end:
+                break
+            if t>=start and self.counts[p%self.size]:
+                times.append(t)
+                values.append(self.values[p%self.size])
+        return (times,values)
+    
+    def _store(self):
+        # store the average of the current period
+        i                = self.lastPeriod%self.size
+        self.values[i]   = self.sum/self.num if self.num else 0.0
+        self.counts[i]   = min(self.num,0xffff)
+
+class Series(object):
+    '''
+    One field of one mote: a raw ring buffer and the downsampled ones.
+    '''
+    
+    __slots__ = ['raw','tiers']
+    
+    def __init__(self,rawSize,tiers):
+        self.raw                  = RingBuffer(rawSize)
+        self.tiers                = dict(
+            (name,DownsampledRingBuffer(period,size)) for (name,period,size) in tiers
+        )
+    
+    def append(self,timestamp,value):
+        self.raw.append(timestamp,value)
+        for t in self.tiers.values():
+            t.append(timestamp,value)
+
+#============================ fields ==========================================
+
+def _dutyCycle(notif):
+    if notif.numTicsTotal==0:
+        return None
+    return float(notif.numTicsOn)/float(notif.numTicsTotal)*100
+
+def _queueOccupancy(notif):
+    return sum(1 for i in range(10) if getattr(notif,'owner_{0}'.format(i)))
+
+def _neighborRssi(notif):
+    if not notif.used:
+        return None
+    return notif.rssi
+
+def _neighborName(notif):
+    return 'rssi.'+''.join('%02x'%(notif.addr_bodyH>>(8*i) & 0xff) for i in range(8))
+
+#============================ class ===========================================
+
+class StateHistory(eventBusClient.eventBusClient):
+    '''
+    Records the history of selected numeric fields of the status
+    notifications of all motes.
+    
+    The motes are identified by the serial port of their moteConnector.
+    '''
+    
+    TIER_RAW             = 'raw'
+    RAW_SIZE             = 256          # samples
+    TIERS                = [
+        # name   period (s)  size (periods)
+        ('10s',  10,         360),      # 1 hour
+        ('1min', 60,         1440),     # 24 hours
+    ]
+    MAX_SERIES_PER_MOTE  = 32
+    
+    # status notification -> [(series name, or function returning it, function returning the value)]
+    FIELDS               = {
+        'MyDagRank':     [('dagRank',         lambda n: n.myDAGrank)],
+        'MacStats':      [('dutyCycle',       _dutyCycle),
+                          ('numDeSync',       lambda n: n.numDeSync)],
+        'OutputBuffer':  [('outputBufferFill',lambda n: (n.index_write-n.index_read)&0xffff)],
+        'QueueRow':      [('queueOccupancy',  _queueOccupancy)],
+        'NeighborsRow':  [(_neighborName,     _neighborRssi)],
+    }
+    
+    def __init__(self,rawSize=RAW_SIZE,tiers=TIERS,fields=None):
+        '''
+        :param rawSize: Number of raw samples kept per series.
+        :param tiers:   List of (name,period,size) of the downsampling tiers.
+        :param fields:  Names of the status notifications to record, all the
+                        ones in FIELDS if None.
+        '''
+        
+        # log
+        log.info("create instance")
+        
+        # store params
+        self.rawSize              = rawSize
+        self.tiers                = tiers
+        if fields is None:
+            self.fields           = self.FIELDS
+        else:
+            self.fields           = dict((k,v) for (k,v) in self.FIELDS.items() if k in fields)
+        
+        # local variables
+        self.dataLock             = threading.Lock()
+        self.motes                = {}  # mote -> {series name -> Series}
+        self.numDropped           = 0   # samples of series over MAX_SERIES_PER_MOTE
+        
+        # initialize parent class
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name                  = 'StateHistory',
+            registrations         = [
+                {
+                    'sender'      : self.WILDCARD,
+                    'signal'      : 'fromMote.status',
+                    'callback'    : self._receivedStatus_notif,
+                },
+            ]
+        )
+    
+    #======================== public ==========================================
+    
+    def getTierNames(self):
+        return [self.TIER_RAW]+[t[0] for t in self.tiers]
+    
+    def getBytesPerSeries(self):
+        '''
+        :returns: The memory used by the samples of a series, in bytes.
+        '''
+        returnVal  = self.rawSize*(8+4)
+        for (_,_,size) in self.tiers:
+            returnVal += size*(4+2)
+        return returnVal
+    
+    def getMotes(self):
+        with self.dataLock:
+            return dict((m,sorted(s.keys())) for (m,s) in self.motes.items())
+    
+    def query(self,motes=None,series=None,start=None,end=None,tier=TIER_RAW):
+        '''
+        Retrieve the history of several motes.
+        
+        :param motes:  List of motes, all if None.
+        :param series: List of series names, all if None. A name ending with
+                       '*' matches all the series starting with it, e.g.
+                       'rssi.*'.
+        :param start:  Start of the time range (seconds since the epoch);
+                       one hour ago if None.
+        :param end:    End of the time range; now if None.
+        :param tier:   TIER_RAW or the name of a downsampling tier.
+        :raises ValueError: if the tier does not exist.
+        :returns: A dictionary ``{mote: {series: {'t':[...],'v':[...]}}}``,
+                  with the timestamps and values of each series as columns.
+        '''
+        
+        if tier not in self.getTierNames():
+            raise ValueError('unknown tier {0}'.format(tier))
+        
+        if end is None:
+            end   = time.time()
+        if start is None:
+            start = end-3600
+        
+        returnVal = {}
+        with self.dataLock:
+            for mote in (self.motes.keys() if motes is None else motes):
+                moteSeries = self.motes.get(mote)
+                if moteSeries is None:
+                    continue
+                returnVal[mote] = {}
+                for (name,s) in moteSeries.items():
+                    if series is not None and not self._matches(name,series):
+                        continue
+                    if tier==self.TIER_RAW:
+                        (t,v) = s.raw.getRange(start,end)
+                    else:
+                        (t,v) = s.tiers[tier].getRange(start,end)
+                    returnVal[mote][name] = {'t': t,'v': v}
+        return returnVal
+    
+    #======================== private =========================================
+    
+    def _receivedStatus_notif(self,sender,signal,data):
+        
+        fields = self.fields.get(data.__class__.__name__[len('Tuple_'):])
+        if not fields:
+            return
+        
+        mote   = sender[len('moteConnector@'):] if sender.startswith('moteConnector@') else sender
+        now    = time.time()
+        
+        for (name,getValue) in fields:
+            value = getValue(data)
+            if value is None:
+                continue
+            if callable(name):
+                name = name(data)
+            self._append(mote,name,now,value)
+    
+    def _append(self,mote,name,timestamp,value):
+        with self.dataLock:
+            moteSeries = self.motes.setdefault(mote,{})
+            s          = moteSeries.get(name)
+            if s is None:
+                if len(moteSeries)>=self.MAX_SERIES_PER_MOTE:
+                    self.numDropped += 1
+                    return
+                s = Series(self.rawSize,self.tiers)
+                moteSeries[name] = s
+            s.append(timestamp,value)
+    
+    def _matches(self,name,series):
+        for s in series:
+            if s==name or (s.endswith('*') and name.startswith(s[:-1])):
+                return True
+        return False
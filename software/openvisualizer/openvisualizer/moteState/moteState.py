@@ -13,7 +13,10 @@ log = logging.getLogger('moteState')
 log.setLevel(logging.ERROR)
 log.addHandler(logging.NullHandler())
 
+import array
 import copy
+import itertools
+import operator
 import time
 import threading
 import json
@@ -37,11 +40,17 @@ class OpenEncoder(json.JSONEncoder):
 class StateElem(object):
     '''
     Abstract superclass for internal mote state classes.
+    
+    The serialized forms of an element are cached until its next update(),
+    so serializing an element which has not changed costs a lookup. The
+    subclasses must only modify an element (or its rows) from its update().
     '''
     
     def __init__(self):
         self.meta                      = [{}]
         self.data                      = []
+        self.cachedDict                = None
+        self.cachedJson                = {}
         
         self.meta[0]['numUpdates']     = 0
         self.meta[0]['lastUpdated']    = None
@@ -51,6 +60,14 @@ class StateElem(object):
     def update(self):
         self.meta[0]['lastUpdated']    = time.time()
         self.meta[0]['numUpdates']    += 1
+        self.cachedDict                = None
+        self.cachedJson                = {}
+    
+    def getVersion(self):
+        '''
+        :returns: A counter incremented each time this element is updated.
+        '''
+        return self.meta[0]['numUpdates']
     
     def toJson(self, aspect='all', isPrettyPrint=False):
         '''
@@ -69,6 +86,11 @@ class StateElem(object):
                 for the meta and data aspects. Otherwise, the JSON
                 is a list of the selected aspect's content.
         '''
+        key     = (aspect,bool(isPrettyPrint))
+        cached  = self.cachedJson.get(key)
+        if cached is not None:
+            return cached
+        
         content = None
         if aspect   == 'all':
             content = self._toDict()
@@ -78,10 +100,12 @@ class StateElem(object):
             content = self._elemToDict(self.meta)
         else:
             raise ValueError('No aspect named {0}'.format(aspect))
-            
-        return json.dumps(content,
-                          sort_keys = bool(isPrettyPrint),
-                          indent    = 4 if isPrettyPrint else None)
+        
+        returnVal = json.dumps(content,
+                               sort_keys = bool(isPrettyPrint),
+                               indent    = 4 if isPrettyPrint else None)
+        self.cachedJson[key] = returnVal
+        return returnVal
     
     def __str__(self):
         return self.toJson(isPrettyPrint=True)
@@ -89,10 +113,12 @@ class StateElem(object):
     #======================== private =========================================
     
     def _toDict(self):
-        returnVal = {}
-        returnVal['meta'] = self._elemToDict(self.meta)
-        returnVal['data'] = self._elemToDict(self.data)
-        return returnVal
+        if self.cachedDict is None:
+            returnVal = {}
+            returnVal['meta'] = self._elemToDict(self.meta)
+            returnVal['data'] = self._elemToDict(self.data)
+            self.cachedDict   = returnVal
+        return self.cachedDict
     
     def _elemToDict(self,elem):
         returnval = []
@@ -109,6 +135,9 @@ class StateElem(object):
                            returnval[-1][k] = v.__name__
                         else:
                            returnval[-1][k] = v
+            elif isinstance(elem[rowNum],StateTableRow):
+                if elem[rowNum].isUpdated():
+                    returnval.append(elem[rowNum].toDict())
             elif isinstance(elem[rowNum],StateElem):
                 parsedRow = elem[rowNum]._toDict()
                 assert('data' in parsedRow)
@@ -119,6 +148,33 @@ class StateElem(object):
                 raise SystemError("can not parse elem of type {0}".format(type(elem[rowNum])))
         return returnval
 
+class StateTableRow(object):
+    '''
+    Abstract superclass for the rows of a StateTable.
+    
+    A row is a view on the columns of its table. Subclasses list in COLUMNS
+    the fields of the status notification stored for each row, with the
+    typecode of the array holding them (None to hold them in a list), and
+    format the fields of a row in toDict().
+    '''
+    
+    __slots__ = ['table','index']
+    
+    COLUMNS   = []
+    
+    def __init__(self,table,index):
+        self.table = table
+        self.index = index
+    
+    def __getitem__(self,name):
+        return self.table.columns[name][self.index]
+    
+    def isUpdated(self):
+        return self.table.isUpdated[self.index]==1
+    
+    def toDict(self):
+        raise NotImplementedError()
+
 class StateOutputBuffer(StateElem):
     
     def update(self,notif):
@@ -157,31 +213,44 @@ class StateMacStats(StateElem):
         else:
             self.data[0]['dutyCycle']       = '?'
 
-class StateScheduleRow(StateElem):
-
-    def update(self,notif):
-        StateElem.update(self)
-        if len(self.data)==0:
-            self.data.append({})
-        self.data[0]['slotOffset']          = notif.slotOffset
-        if 'type' not in self.data[0]:
-            self.data[0]['type']            = typeCellType.typeCellType()
-        self.data[0]['type'].update(notif.type)
-        self.data[0]['shared']              = notif.shared
-        self.data[0]['channelOffset']       = notif.channelOffset
-        if 'neighbor' not in self.data[0]:
-            self.data[0]['neighbor']        = typeAddr.typeAddr()
-        self.data[0]['neighbor'].update(notif.neighbor_type,
-                                        notif.neighbor_bodyH,
-                                        notif.neighbor_bodyL)
-        self.data[0]['numRx']               = notif.numRx
-        self.data[0]['numTx']               = notif.numTx
-        self.data[0]['numTxACK']            = notif.numTxACK
-        if 'lastUsedAsn' not in self.data[0]:
-            self.data[0]['lastUsedAsn']     = typeAsn.typeAsn()
-        self.data[0]['lastUsedAsn'].update(notif.lastUsedAsn_0_1,
-                                           notif.lastUsedAsn_2_3,
-                                           notif.lastUsedAsn_4)
+class StateScheduleRow(StateTableRow):
+    
+    __slots__ = []
+    
+    COLUMNS   = [
+        ('slotOffset',      'H'),
+        ('type',            'B'),
+        ('shared',          'B'),
+        ('channelOffset',   'B'),
+        ('neighbor_type',   'B'),
+        ('neighbor_bodyH',  None),
+        ('neighbor_bodyL',  None),
+        ('numRx',           'B'),
+        ('numTx',           'B'),
+        ('numTxACK',        'B'),
+        ('lastUsedAsn_4',   'B'),
+        ('lastUsedAsn_2_3', 'H'),
+        ('lastUsedAsn_0_1', 'H'),
+    ]
+    
+    def toDict(self):
+        c = self.table.columns
+        i = self.index
+        return {
+            'slotOffset':       c['slotOffset'][i],
+            'type':             typeCellType.typeCellType.toString(c['type'][i]),
+            'shared':           c['shared'][i],
+            'channelOffset':    c['channelOffset'][i],
+            'neighbor':         typeAddr.typeAddr.toString(c['neighbor_type'][i],
+                                                           c['neighbor_bodyH'][i],
+                                                           c['neighbor_bodyL'][i]),
+            'numRx':            c['numRx'][i],
+            'numTx':            c['numTx'][i],
+            'numTxACK':         c['numTxACK'][i],
+            'lastUsedAsn':      typeAsn.typeAsn.toString(c['lastUsedAsn_0_1'][i],
+                                                         c['lastUsedAsn_2_3'][i],
+                                                         c['lastUsedAsn_4'][i]),
+        }
 
 class StateBackoff(StateElem):
     
@@ -227,36 +296,54 @@ class StateQueue(StateElem):
         self.data[8].update(notif.creator_8,notif.owner_8)
         self.data[9].update(notif.creator_9,notif.owner_9)
 
-class StateNeighborsRow(StateElem):
+class StateNeighborsRow(StateTableRow):
+    
+    __slots__ = []
+    
+    COLUMNS   = [
+        ('used',                    'B'),
+        ('parentPreference',        'B'),
+        ('stableNeighbor',          'B'),
+        ('switchStabilityCounter',  'B'),
+        ('addr_type',               'B'),
+        ('addr_bodyH',              None),
+        ('addr_bodyL',              None),
+        ('DAGrank',                 'H'),
+        ('rssi',                    'b'),
+        ('numRx',                   'B'),
+        ('numTx',                   'B'),
+        ('numTxACK',                'B'),
+        ('numWraps',                'B'),
+        ('asn_4',                   'B'),
+        ('asn_2_3',                 'H'),
+        ('asn_0_1',                 'H'),
+        ('joinPrio',                'B'),
+        ('f6PNORES',                'B'),
+    ]
     
-    def update(self,notif):
-        StateElem.update(self)
-        if len(self.data)==0:
-            self.data.append({})
-        self.data[0]['used']                     = notif.used
-        self.data[0]['parentPreference']         = notif.parentPreference
-        self.data[0]['stableNeighbor']           = notif.stableNeighbor
-        self.data[0]['switchStabilityCounter']   = notif.switchStabilityCounter
-        self.data[0]['joinPrio']                 = notif.joinPrio
-        if 'addr' not in self.data[0]:
-            self.data[0]['addr']                 = typeAddr.typeAddr()
-        self.data[0]['addr'].update(notif.addr_type,
-                                    notif.addr_bodyH,
-                                    notif.addr_bodyL)
-        self.data[0]['DAGrank']                  = notif.DAGrank
-        if 'rssi' not in self.data[0]:
-            self.data[0]['rssi']                 = typeRssi.typeRssi()
-        self.data[0]['rssi'].update(notif.rssi)
-        self.data[0]['numRx']                    = notif.numRx
-        self.data[0]['numTx']                    = notif.numTx
-        self.data[0]['numTxACK']                 = notif.numTxACK
-        self.data[0]['numWraps']                 = notif.numWraps
-        if 'asn' not in self.data[0]:
-            self.data[0]['asn']                  = typeAsn.typeAsn()
-        self.data[0]['asn'].update(notif.asn_0_1,
-                                   notif.asn_2_3,
-                                   notif.asn_4)
-        self.data[0]['f6PNORES']                 = notif.f6PNORES
+    def toDict(self):
+        c = self.table.columns
+        i = self.index
+        return {
+            'used':                     c['used'][i],
+            'parentPreference':         c['parentPreference'][i],
+            'stableNeighbor':           c['stableNeighbor'][i],
+            'switchStabilityCounter':   c['switchStabilityCounter'][i],
+            'joinPrio':                 c['joinPrio'][i],
+            'addr':                     typeAddr.typeAddr.toString(c['addr_type'][i],
+                                                                   c['addr_bodyH'][i],
+                                                                   c['addr_bodyL'][i]),
+            'DAGrank':                  c['DAGrank'][i],
+            'rssi':                     typeRssi.typeRssi.toString(c['rssi'][i]),
+            'numRx':                    c['numRx'][i],
+            'numTx':                    c['numTx'][i],
+            'numTxACK':                 c['numTxACK'][i],
+            'numWraps':                 c['numWraps'][i],
+            'asn':                      typeAsn.typeAsn.toString(c['asn_0_1'][i],
+                                                                 c['asn_2_3'][i],
+                                                                 c['asn_4'][i]),
+            'f6PNORES':                 c['f6PNORES'][i],
+        }
 
 class StateIsSync(StateElem):
     
@@ -268,11 +355,13 @@ class StateIsSync(StateElem):
 
 class StateIdManager(StateElem):
     
-    def __init__(self,eventBusClient,moteConnector):
+    def __init__(self,eventBusClient,moteConnector,addressListener=None):
         StateElem.__init__(self)
         self.eventBusClient  = eventBusClient
         self.moteConnector   = moteConnector
+        self.addressListener = addressListener
         self.isDAGroot       = None
+        self.addr16b         = None
     
     def get16bAddr(self):
         try:
@@ -280,6 +369,13 @@ class StateIdManager(StateElem):
         except IndexError:
             return None
     
+    def get16bAddrHex(self):
+        '''
+        :returns: The 16-bit address as a hex string (e.g. '9a3c'), None if
+                  not known yet.
+        '''
+        return self.addr16b
+    
     def update(self,notif):
     
         # update state
@@ -304,6 +400,11 @@ class StateIdManager(StateElem):
             notif.my16bID_0,
             notif.my16bID_1,
         ]
+        addr16b = '{0:02x}{1:02x}'.format(notif.my16bID_0,notif.my16bID_1)
+        if addr16b!=self.addr16b:
+            (oldAddr16b,self.addr16b) = (self.addr16b,addr16b)
+            if self.addressListener:
+                self.addressListener(self.eventBusClient,oldAddr16b,addr16b)
         
         if 'my64bID' not  in self.data[0]:
             self.data[0]['my64bID']         = typeAddr.typeAddr()
@@ -366,19 +467,49 @@ class StatekaPeriod(StateElem):
         self.data[0]['kaPeriod']            = notif.kaPeriod
 
 class StateTable(StateElem):
-
+    '''
+    Table of rows received one by one, e.g. the schedule of a mote.
+    
+    The rows are stored column by column, in fixed-width arrays (or a list,
+    for the 64-bit address bodies Python 2 arrays cannot hold), so updating a
+    row allocates nothing. The fields are only formatted when the table is
+    serialized. Rows which were never updated are not serialized.
+    '''
+    
     def __init__(self,rowClass,columnOrder=None):
         StateElem.__init__(self)
         self.meta[0]['rowClass']            = rowClass
         if columnOrder:
             self.meta[0]['columnOrder']     = columnOrder
         self.data                           = []
-
+        self.columns                        = {}
+        self.columnList                     = []
+        for (name,typecode) in rowClass.COLUMNS:
+            column                          = array.array(typecode) if typecode else []
+            self.columns[name]              = column
+            self.columnList                += [column]
+        self.isUpdated                      = array.array('B')
+        self.getValues                      = operator.attrgetter(
+            *[name for (name,_) in rowClass.COLUMNS]
+        )
+    
     def update(self,notif):
         StateElem.update(self)
-        while len(self.data)<notif.row+1:
-            self.data.append(self.meta[0]['rowClass']())
-        self.data[notif.row].update(notif)
+        row = notif.row
+        if row>=len(self.data):
+            self._addRows(row+1)
+        for (column,value) in itertools.izip(self.columnList,self.getValues(notif)):
+            column[row] = value
+        self.isUpdated[row] = 1
+    
+    def _addRows(self,numRows):
+        newRows = [0]*(numRows-len(self.data))
+        for column in self.columnList:
+            column.extend(newRows)
+        self.isUpdated.extend(newRows)
+        self.data += [
+            self.meta[0]['rowClass'](self,i) for i in range(len(self.data),numRows)
+        ]
 
 class moteState(eventBusClient.eventBusClient):
     
@@ -457,7 +588,14 @@ class moteState(eventBusClient.eventBusClient):
         TRIGGER_DAGROOT,
     ]
     
-    def __init__(self,moteConnector):
+    def __init__(self,moteConnector,addressListener=None):
+        '''
+        :param addressListener: Function called as
+                                ``addressListener(moteState,oldAddr,newAddr)``
+                                when the 16-bit address of the mote changes.
+                                The addresses are hex strings, oldAddr is
+                                None the first time.
+        '''
         
         # log
         log.info("create instance")
@@ -470,6 +608,8 @@ class moteState(eventBusClient.eventBusClient):
         self.parserStatus                   = ParserStatus.ParserStatus()
         self.stateLock                      = threading.Lock()
         self.state                          = {}
+        # distinguishes the versions of this instance from those of another
+        self.versionPrefix                  = '{0:x}.{1:x}'.format(int(time.time()*1000),id(self))
         
         self.state[self.ST_OUPUTBUFFER]     = StateOutputBuffer()
         self.state[self.ST_ASN]             = StateAsn()
@@ -515,7 +655,8 @@ class moteState(eventBusClient.eventBusClient):
         self.state[self.ST_ISSYNC]          = StateIsSync()
         self.state[self.ST_IDMANAGER]       = StateIdManager(
                                                 self,
-                                                self.moteConnector
+                                                self.moteConnector,
+                                                addressListener
                                               )
         self.state[self.ST_MYDAGRANK]       = StateMyDagRank()
         self.state[self.ST_KAPERIOD]        = StatekaPeriod()
@@ -579,6 +720,67 @@ class moteState(eventBusClient.eventBusClient):
         
         return returnVal
     
+    def getStateElemJson(self,elemName,aspect='all'):
+        '''
+        Serializes a state element to JSON, consistently with the updates
+        received from the mote.
+        
+        :param aspect: The aspect to serialize, see StateElem.toJson().
+        '''
+        
+        elem = self.getStateElem(elemName)
+        
+        with self.stateLock:
+            return elem.toJson(aspect)
+    
+    def getStateData(self,elemNames=None,fields=None):
+        '''
+        Returns the data of several state elements at once, consistently with
+        the updates received from the mote.
+        
+        :param elemNames: The names of the elements, all if None.
+        :param fields:    The names of the fields to return in each row, all
+                          if None.
+        :returns: A dictionary ``{elemName: [row,...]}``, where each row is a
+                  dictionary. The rows must not be modified.
+        '''
+        
+        if elemNames is None:
+            elemNames = self.getStateElemNames()
+        for name in elemNames:
+            if name not in self.state:
+                raise ValueError('No state called {0}'.format(name))
+        
+        returnVal = {}
+        with self.stateLock:
+            for name in elemNames:
+                rows = self.state[name]._toDict()['data']
+                if fields is not None:
+                    rows = [
+                        dict((f,row[f]) for f in fields if f in row) for row in rows
+                    ]
+                returnVal[name] = rows
+        
+        return returnVal
+    
+    def getStateVersion(self,elemNames=None):
+        '''
+        Returns a version of several state elements, e.g. to use as an HTTP
+        ETag. The version changes whenever any of the elements is updated,
+        and differs between moteState instances.
+        
+        :param elemNames: The names of the elements, all if None.
+        '''
+        
+        if elemNames is None:
+            elemNames = self.getStateElemNames()
+        
+        # the versions of the elements only increase, so does their sum
+        with self.stateLock:
+            version = sum(self.state[n].getVersion() for n in elemNames)
+        
+        return '{0}.{1:x}'.format(self.versionPrefix,version)
+    
     def triggerAction(self,action):
         
         # dispatch
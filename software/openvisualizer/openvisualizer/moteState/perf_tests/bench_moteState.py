@@ -0,0 +1,148 @@
+'''
+Benchmark of the schedule and neighbor tables of moteState.
+
+Feeds the status notifications of a mote with a large schedule and many
+neighbors into its moteState, and prints the number of rows ingested and
+serialized per second, as well as the memory used by the tables.
+
+Run this benchmark by double-clicking on this file, or with
+'python bench_moteState.py'.
+'''
+
+import sys
+import os
+if __name__=='__main__':
+    here = sys.path[0]
+    sys.path.insert(0, os.path.join(here, '..', '..', '..'))                     # root/
+    sys.path.insert(0, os.path.join(here, '..'))                                 # moteState/
+
+import array
+import time
+import types
+
+import moteState
+
+#============================ defines =========================================
+
+NUM_SCHEDULE_ROWS    = 101
+NUM_NEIGHBORS_ROWS   = 30
+NUM_ROUNDS           = 200
+
+#============================ helpers =========================================
+
+class FakeMoteConnector(object):
+    
+    def __init__(self):
+        self.serialport = 'bench'
+
+def notif(ms,name,**fields):
+    tupleClass = ms.parserStatus.named_tuple[name]
+    values     = dict((f,0) for f in tupleClass._fields)
+    values.update(fields)
+    return tupleClass(**values)
+
+def scheduleNotifs(ms,round):
+    return [
+        notif(ms,ms.ST_SCHEDULEROW,
+            row                  = row,
+            slotOffset           = row,
+            type                 = 1+row%3,
+            shared               = 1 if row==0 else 0,
+            channelOffset        = row%16,
+            neighbor_type        = 2,
+            neighbor_bodyH       = 0x0100000000001514|(row<<56),
+            numRx                = round%256,
+            numTx                = (round+row)%256,
+            numTxACK             = round%256,
+            lastUsedAsn_0_1      = round,
+        )
+        for row in range(NUM_SCHEDULE_ROWS)
+    ]
+
+def neighborsNotifs(ms,round):
+    return [
+        notif(ms,ms.ST_NEIGHBORSROW,
+            row                  = row,
+            used                 = 1,
+            addr_type            = 2,
+            addr_bodyH           = 0x0100000000001514|(row<<56),
+            DAGrank              = 256*(row+1),
+            rssi                 = -40-row,
+            numRx                = round%256,
+            numTx                = round%256,
+            numTxACK             = round%256,
+            asn_0_1              = round,
+        )
+        for row in range(NUM_NEIGHBORS_ROWS)
+    ]
+
+def deepSizeOf(obj,seen=None):
+    '''
+    Approximate number of bytes used by an object and the objects it
+    references, counting shared objects once.
+    '''
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or isinstance(obj,(type,types.ClassType,types.FunctionType,types.MethodType)):
+        return 0
+    seen.add(id(obj))
+    
+    size = sys.getsizeof(obj)
+    if isinstance(obj,dict):
+        size += sum(deepSizeOf(k,seen)+deepSizeOf(v,seen) for (k,v) in obj.items())
+    elif isinstance(obj,(list,tuple,set)):
+        size += sum(deepSizeOf(i,seen) for i in obj)
+    elif isinstance(obj,(str,unicode,int,long,float,bool,array.array)) or obj is None:
+        pass
+    else:
+        if hasattr(obj,'__dict__'):
+            size += deepSizeOf(obj.__dict__,seen)
+        for cls in type(obj).__mro__:
+            for slot in getattr(cls,'__slots__',[]):
+                if hasattr(obj,slot):
+                    size += deepSizeOf(getattr(obj,slot),seen)
+    return size
+
+#============================ main ============================================
+
+def main():
+    
+    ms        = moteState.moteState(FakeMoteConnector())
+    schedule  = ms.getStateElem(ms.ST_SCHEDULE)
+    neighbors = ms.getStateElem(ms.ST_NEIGHBORS)
+    
+    rounds    = [scheduleNotifs(ms,r)+neighborsNotifs(ms,r) for r in range(NUM_ROUNDS)]
+    numRows   = NUM_ROUNDS*(NUM_SCHEDULE_ROWS+NUM_NEIGHBORS_ROWS)
+    
+    # ingest
+    startTime = time.time()
+    for notifs in rounds:
+        for n in notifs:
+            ms._receivedStatus_notif('moteConnector@bench','fromMote.status',n)
+    ingestDuration = time.time()-startTime
+    
+    # ingest and serialize each round, as when polled by the web UI
+    startTime = time.time()
+    for notifs in rounds:
+        for n in notifs:
+            ms._receivedStatus_notif('moteConnector@bench','fromMote.status',n)
+        schedule.toJson('data')
+        neighbors.toJson('data')
+    pollDuration   = time.time()-startTime
+    
+    print '{0} schedule rows, {1} neighbors rows, {2} rounds'.format(
+        NUM_SCHEDULE_ROWS,
+        NUM_NEIGHBORS_ROWS,
+        NUM_ROUNDS,
+    )
+    print '{0:>10.0f} rows/s ingested'.format(numRows/ingestDuration)
+    print '{0:>10.0f} rows/s ingested and serialized'.format(numRows/pollDuration)
+    
+    # memory, without the serialized forms
+    schedule.update(notif(ms,ms.ST_SCHEDULEROW,row=0))
+    neighbors.update(notif(ms,ms.ST_NEIGHBORSROW,row=0))
+    print '{0:>10} bytes for the schedule'.format(deepSizeOf(schedule))
+    print '{0:>10} bytes for the neighbors'.format(deepSizeOf(neighbors))
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))               # root/
+sys.path.insert(0, os.path.join(here, '..'))                           # moteState/
+
+import math
+import time
+
+from pydispatch import dispatcher
+
+import StateHistory
+from openvisualizer.moteConnector import ParserStatus
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_StateHistory.log'
+
+import logging
+log = logging.getLogger('test_StateHistory')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  maxBytes=2*1024*1024,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in   [
+                        'test_StateHistory',
+                        'StateHistory',
+                    ]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ helpers =========================================
+
+PARSER_STATUS = ParserStatus.ParserStatus()
+
+def notif(name,**fields):
+    tupleClass = PARSER_STATUS.named_tuple[name]
+    values     = dict((f,0) for f in tupleClass._fields)
+    values.update(fields)
+    return tupleClass(**values)
+
+def send(port,data):
+    dispatcher.send(
+        sender = 'moteConnector@{0}'.format(port),
+        signal = 'fromMote.status',
+        data   = data,
+    )
+
+#============================ tests ===========================================
+
+def test_ringBufferWrap():
+    
+    ring = StateHistory.RingBuffer(4)
+    for i in range(10):
+        ring.append(100+i,i)
+    
+    (t,v) = ring.getRange(0,1000)
+    assert t==[106,107,108,109]
+    assert v==[6,7,8,9]
+    
+    (t,v) = ring.getRange(107,108)
+    assert t==[107,108]
+
+def test_downsampledAverages():
+    
+    ring = StateHistory.DownsampledRingBuffer(10,3)
+    for ts in [0,5,10,11,12,45]:
+        ring.append(ts,ts)
+    
+    # period 20-29 and 30-39 have no samples; period 0-9 was overwritten
+    (t,v) = ring.getRange(0,1000)
+    assert t==[40]
+    assert v==[45]
+    
+    ring = StateHistory.DownsampledRingBuffer(10,6)
+    for ts in [0,5,10,11,12,45]:
+        ring.append(ts,ts)
+    (t,v) = ring.getRange(0,1000)
+    assert t==[0,10,40]
+    assert v==[2.5,11,45]
+    
+    # the current period is returned as its running average
+    ring.append(49,49)
+    assert ring.getRange(40,40)==([40],[47])
+
+def test_queryManyMotes():
+    
+    history = StateHistory.StateHistory()
+    
+    for (port,rank) in [('histA',256),('histB',512)]:
+        send(port,notif('MyDagRank',myDAGrank=rank))
+        send(port,notif('MacStats',numTicsOn=25,numTicsTotal=100,numDeSync=1))
+        send(port,notif('QueueRow',owner_0=1,owner_3=2))
+        send(port,notif('NeighborsRow',used=1,addr_bodyH=0x0100000000000000|rank,rssi=-70))
+        send(port,notif('NeighborsRow',used=0,addr_bodyH=0x42,rssi=-10))
+    
+    result = history.query(motes=['histA','histB','unknown'])
+    assert sorted(result.keys())==['histA','histB']
+    assert result['histA']['dagRank']['v']==[256]
+    assert result['histB']['dagRank']['v']==[512]
+    assert result['histA']['dutyCycle']['v']==[25]
+    assert result['histA']['queueOccupancy']['v']==[2]
+    assert result['histA']['rssi.0001000000000001']['v']==[-70]
+    assert len(result['histA']['dagRank']['t'])==1
+    
+    result = history.query(motes=['histA'],series=['rssi.*'],tier='1min')
+    assert result['histA'].keys()==['rssi.0001000000000001']
+    assert result['histA']['rssi.0001000000000001']['t'][0]==math.floor(time.time()/60)*60
+
+def test_boundedMemory():
+    
+    history = StateHistory.StateHistory(fields=['NeighborsRow'])
+    
+    # 24h of samples for 200 motes with all their series fit in under 96MB
+    assert history.getBytesPerSeries()*history.MAX_SERIES_PER_MOTE*200<96*1024*1024
+    
+    # the number of series per mote is capped
+    for i in range(history.MAX_SERIES_PER_MOTE+5):
+        send('histC',notif('NeighborsRow',used=1,addr_bodyH=i,rssi=-50))
+    assert len(history.getMotes()['histC'])==history.MAX_SERIES_PER_MOTE
+    assert history.numDropped==5
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..', '..'))               # root/
+sys.path.insert(0, os.path.join(here, '..'))                           # moteState/
+
+import json
+
+import pytest
+
+import moteState
+from openvisualizer.openType import typeAddr, typeAsn, typeCellType
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_moteState.log'
+
+import logging
+log = logging.getLogger('test_moteState')
+log.setLevel(logging.ERROR)
+log.addHandler(logging.NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  maxBytes=2*1024*1024,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in   [
+                        'test_moteState',
+                        'moteState',
+                    ]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ helpers =========================================
+
+class FakeMoteConnector(object):
+    
+    def __init__(self):
+        self.serialport = 'fake'
+
+def notif(ms,name,**fields):
+    tupleClass = ms.parserStatus.named_tuple[name]
+    values     = dict((f,0) for f in tupleClass._fields)
+    values.update(fields)
+    return tupleClass(**values)
+
+def uncachedJson(elem,aspect):
+    elem.cachedDict = None
+    elem.cachedJson = {}
+    return elem.toJson(aspect)
+
+@pytest.fixture
+def ms():
+    return moteState.moteState(FakeMoteConnector())
+
+#============================ tests ===========================================
+
+def test_jsonCachedUntilUpdate(ms):
+    
+    elem = ms.getStateElem(ms.ST_MYDAGRANK)
+    elem.update(notif(ms,ms.ST_MYDAGRANK,myDAGrank=256))
+    
+    first = elem.toJson('data')
+    assert json.loads(first)==[{'myDAGrank':256}]
+    assert elem.toJson('data') is first
+    
+    elem.update(notif(ms,ms.ST_MYDAGRANK,myDAGrank=512))
+    assert json.loads(elem.toJson('data'))==[{'myDAGrank':512}]
+
+def test_tableRowUpdate(ms):
+    
+    schedule = ms.getStateElem(ms.ST_SCHEDULE)
+    for row in range(3):
+        schedule.update(notif(ms,ms.ST_SCHEDULEROW,row=row,slotOffset=row))
+    before   = schedule.toJson('data')
+    
+    schedule.update(notif(ms,ms.ST_SCHEDULEROW,row=1,slotOffset=10,numTx=5))
+    after    = schedule.toJson('data')
+    
+    assert after!=before
+    assert [r['slotOffset'] for r in json.loads(after)]==[0,10,2]
+    for aspect in ['all','data','meta']:
+        assert schedule.toJson(aspect)==uncachedJson(schedule,aspect)
+
+def test_tableSparseRows(ms):
+    
+    neighbors = ms.getStateElem(ms.ST_NEIGHBORS)
+    neighbors.update(notif(ms,ms.ST_NEIGHBORSROW,row=2,used=1,addr_type=2,addr_bodyH=0x0100000000001514,rssi=-70))
+    
+    # rows never updated are not serialized
+    rows = json.loads(neighbors.toJson('data'))
+    assert len(rows)==1
+    assert rows[0]['addr']=='14-15-00-00-00-00-00-01 (64b)'
+    assert rows[0]['rssi']=='-70 dBm'
+    assert neighbors.data[2]['rssi']==-70
+    assert not neighbors.data[0].isUpdated()
+
+def test_tableFormatsLikeOpenTypes():
+    
+    for addrType in range(8):
+        addr = typeAddr.typeAddr()
+        addr.update(addrType,0x0102030405060708,0x1112131415161718)
+        assert typeAddr.typeAddr.toString(addrType,0x0102030405060708,0x1112131415161718)==str(addr)
+    
+    asn = typeAsn.typeAsn()
+    asn.update(0x0405,0x0203,0x01)
+    assert typeAsn.typeAsn.toString(0x0405,0x0203,0x01)==str(asn)=='0x0102030405'
+    
+    for cellType in range(8):
+        cell = typeCellType.typeCellType()
+        cell.update(cellType)
+        assert typeCellType.typeCellType.toString(cellType)==str(cell)
+
+def test_stateVersion(ms):
+    
+    names    = [ms.ST_ASN,ms.ST_QUEUE]
+    version  = ms.getStateVersion(names)
+    assert ms.getStateVersion(names)==version
+    
+    ms.getStateElem(ms.ST_MYDAGRANK).update(notif(ms,ms.ST_MYDAGRANK))
+    assert ms.getStateVersion(names)==version
+    
+    ms.getStateElem(ms.ST_QUEUE).update(notif(ms,ms.ST_QUEUEROW))
+    assert ms.getStateVersion(names)!=version
+    
+    # another moteState in the same state has another version
+    other    = moteState.moteState(FakeMoteConnector())
+    other.getStateElem(other.ST_QUEUE).update(notif(other,other.ST_QUEUEROW))
+    assert other.getStateVersion(names)!=ms.getStateVersion(names)
+
+def test_getStateElemJson(ms):
+    
+    ms.getStateElem(ms.ST_ASN).update(notif(ms,ms.ST_ASN,asn_0_1=1))
+    assert ms.getStateElemJson(ms.ST_ASN,'data')==ms.getStateElem(ms.ST_ASN).toJson('data')
+    
+    with pytest.raises(ValueError):
+        ms.getStateElemJson('noSuchState')
+
+def test_getStateData(ms):
+    
+    schedule = ms.getStateElem(ms.ST_SCHEDULE)
+    for row in range(2):
+        schedule.update(notif(ms,ms.ST_SCHEDULEROW,row=row,slotOffset=row,numTx=3))
+    ms.getStateElem(ms.ST_MYDAGRANK).update(notif(ms,ms.ST_MYDAGRANK,myDAGrank=256))
+    
+    data = ms.getStateData([ms.ST_SCHEDULE,ms.ST_MYDAGRANK],fields=['slotOffset','myDAGrank'])
+    assert data=={
+        ms.ST_SCHEDULE:   [{'slotOffset':0},{'slotOffset':1}],
+        ms.ST_MYDAGRANK:  [{'myDAGrank':256}],
+    }
+    
+    data = ms.getStateData([ms.ST_SCHEDULE])
+    assert data[ms.ST_SCHEDULE]==json.loads(schedule.toJson('data'))
+    
+    with pytest.raises(ValueError):
+        ms.getStateData(['noSuchState'])
+
+def test_addressListener():
+    
+    changes = []
+    ms = moteState.moteState(
+        FakeMoteConnector(),
+        addressListener = lambda ms,oldAddr,newAddr: changes.append((ms,oldAddr,newAddr)),
+    )
+    idManager = ms.getStateElem(ms.ST_IDMANAGER)
+    assert idManager.get16bAddrHex() is None
+    
+    idManager.update(notif(ms,ms.ST_IDMANAGER,my16bID_0=0x9a,my16bID_1=0x3c))
+    idManager.update(notif(ms,ms.ST_IDMANAGER,my16bID_0=0x9a,my16bID_1=0x3c))
+    assert changes==[(ms,None,'9a3c')]
+    assert idManager.get16bAddrHex()=='9a3c'
+    
+    idManager.update(notif(ms,ms.ST_IDMANAGER,my16bID_0=0x00,my16bID_1=0x01))
+    assert changes[-1]==(ms,'9a3c','0001')
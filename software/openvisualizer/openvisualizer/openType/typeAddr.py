@@ -20,6 +20,17 @@ class typeAddr(openType.openType):
     ADDR_PREFIX  = 5
     ADDR_ANYCAST = 6
     
+    # type -> (description, length in bytes)
+    DESC_AND_LENGTH = {
+        ADDR_NONE:    ('None',    0),
+        ADDR_16B:     ('16b',     2),
+        ADDR_64B:     ('64b',     8),
+        ADDR_128B:    ('128b',   16),
+        ADDR_PANID:   ('panId',   2),
+        ADDR_PREFIX:  ('prefix',  8),
+        ADDR_ANYCAST: ('anycast', 0),
+    }
+    
     def __init__(self):
         # log
         log.info("creating object")
@@ -36,6 +47,21 @@ class typeAddr(openType.openType):
     
     #======================== public ==========================================
     
+    @classmethod
+    def toString(cls,type,bodyH,bodyL):
+        '''
+        Formats an address given as the fields of a status notification, as
+        str() of a typeAddr updated with the same fields would, without
+        creating the typeAddr.
+        '''
+        (desc,length) = cls.DESC_AND_LENGTH.get(type,('unknown',0))
+        if length==0:
+            return ' ({0})'.format(desc)
+        fullAddr = [bodyH>>(8*i) & 0xff for i in range(8)]
+        if length>8:
+            fullAddr += [bodyL>>(8*i) & 0xff for i in range(8)]
+        return '{0} ({1})'.format('-'.join(["%.2x"%b for b in fullAddr[:length]]),desc)
+    
     def update(self,type,bodyH,bodyL):
         fullAddr = [
             bodyH>>(8*0) & 0xff,
@@ -24,6 +24,20 @@ class typeAsn(openType.openType):
     
     #======================== public ==========================================
     
+    @classmethod
+    def toString(cls,byte0_1,byte2_3,byte4):
+        '''
+        Formats an ASN given as the fields of a status notification, as str()
+        of a typeAsn updated with the same fields would.
+        '''
+        return '0x{0:02x}{1:02x}{2:02x}{3:02x}{4:02x}'.format(
+            byte4,
+            byte2_3>>8,
+            byte2_3%256,
+            byte0_1>>8,
+            byte0_1%256,
+        )
+    
     def update(self,byte0_1,byte2_3,byte4):
         self.asn =  [
                         byte4,
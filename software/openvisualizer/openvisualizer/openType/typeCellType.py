@@ -19,6 +19,15 @@ class typeCellType(openType.openType):
     CELLTYPE_SERIALRX        = 4
     CELLTYPE_MORESERIALRX    = 5
     
+    DESC                     = {
+        CELLTYPE_OFF:            'OFF',
+        CELLTYPE_TX:             'TX',
+        CELLTYPE_RX:             'RX',
+        CELLTYPE_TXRX:           'TXRX',
+        CELLTYPE_SERIALRX:       'SERIALRX',
+        CELLTYPE_MORESERIALRX:   'MORESERIALRX',
+    }
+    
     def __init__(self):
         # log
         log.info("creating object")
@@ -31,6 +40,10 @@ class typeCellType(openType.openType):
     
     #======================== public ==========================================
     
+    @classmethod
+    def toString(cls,type):
+        return '{0} ({1})'.format(type,cls.DESC.get(type,'unknown'))
+    
     def update(self,type):
         self.type = type
         if   type==self.CELLTYPE_OFF:
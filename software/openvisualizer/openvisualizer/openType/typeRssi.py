@@ -24,6 +24,10 @@ class typeRssi(openType.openType):
     
     #======================== public ==========================================
     
+    @classmethod
+    def toString(cls,rssi):
+        return '{0} dBm'.format(rssi)
+    
     def update(self,rssi):
         self.rssi = rssi
     